@@ -0,0 +1,237 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from maprandogen import percentile, process_tree_rss
+from mock_server import MockMaprandoServer, ROM_SIZE
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'maprandogen.py')
+BENCHMARK_PRESET = {"other_settings": {"race_mode": True}}
+STARTUP_RUNS = 5
+STARTUP_BUDGET = 0.15
+SELENIUM_CHECK = """
+import runpy, sys
+class SeleniumFinder:
+    loaded = False
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] == 'selenium':
+            SeleniumFinder.loaded = True
+sys.meta_path.insert(0, SeleniumFinder())
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit:
+    pass
+sys.stderr.write(SeleniumFinder.loaded and 'SELENIUM_LOADED' or '')
+"""
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        if not os.path.isdir('/proc'):
+            return
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_command(command, cwd=None):
+    start = time.monotonic()
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    sampler = RssSampler(process.pid)
+    sampler.start()
+    output, _ = process.communicate()
+    wall = time.monotonic() - start
+    sampler.stop()
+    return process.returncode, wall, sampler.peak, output
+
+
+def read_trace(trace_path):
+    records = []
+    try:
+        with open(trace_path) as f:
+            for line in f:
+                records.append(json.loads(line))
+    except OSError:
+        pass
+    return records
+
+
+def run_batch(args, server, engine, count, work_dir, preset_path):
+    output_dir = os.path.join(work_dir, f"{engine}-{count}")
+    trace_path = os.path.join(work_dir, f"{engine}-{count}.jsonl")
+    command = [
+        sys.executable, SCRIPT, '-i', args.input, '-e', engine, '-g', str(count), '-o', output_dir,
+        '-p', preset_path, '-w', str(args.workers), '--base-url', server.base_url,
+        '--trace', trace_path, '--offline'
+    ]
+    if engine == 'selenium':
+        command += ['-b', args.browser]
+        if args.lean:
+            command.append('--lean')
+    returncode, wall, peak_rss, output = run_command(command)
+    records = read_trace(trace_path)
+    latencies = [record['end'] - record['start'] for record in records if record['outcome'] == 'ok']
+    server_latencies = [
+        phase['duration'] for record in records if record['outcome'] == 'ok'
+        for phase in record['phases'] if phase['name'] == 'generate'
+    ]
+    if returncode != 0 and args.verbose:
+        print(output)
+    return {
+        'engine': engine,
+        'seeds': count,
+        'ok': len(latencies),
+        'returncode': returncode,
+        'wall': wall,
+        'seeds_per_minute': len(latencies) / wall * 60 if wall else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'max': max(latencies) if latencies else None,
+        'overhead_p50': percentile([total - server for total, server in zip(latencies, server_latencies)], 50),
+        'peak_rss': peak_rss,
+        'output_dir': output_dir
+    }
+
+
+def run_unlock(args, output_dir):
+    token_files = sorted(glob.glob(os.path.join(output_dir, 'SpoilerToken_*.txt')))
+    if not token_files:
+        return None
+    seed_id = os.path.basename(token_files[0])[len('SpoilerToken_'):-len('.txt')]
+    command = [sys.executable, SCRIPT, '-t', seed_id, '-b', args.browser, '--base-url', args.base_url, '--offline']
+    if args.lean:
+        command.append('--lean')
+    returncode, wall, peak_rss, output = run_command(command, cwd=output_dir)
+    if 'Success' not in output and args.verbose:
+        print(output)
+    return {'seed_id': seed_id, 'ok': 'Success' in output, 'wall': wall, 'peak_rss': peak_rss}
+
+
+def measure_startup(command, runs=STARTUP_RUNS):
+    walls = []
+    for _ in range(runs):
+        start = time.monotonic()
+        subprocess.run([sys.executable, SCRIPT, *command], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        walls.append(time.monotonic() - start)
+    check = subprocess.run([sys.executable, '-c', SELENIUM_CHECK, SCRIPT, *command], capture_output=True, text=True)
+    return percentile(walls, 50), 'SELENIUM_LOADED' in check.stderr
+
+
+def run_startup(args):
+    results = []
+    for label, command in [('-l', ['-l']), ('invalid -s', ['-i', args.input, '-s', 'not_a_sprite'])]:
+        p50, selenium_loaded = measure_startup(command)
+        results.append({
+            'command': label,
+            'p50': p50,
+            'selenium_loaded': selenium_loaded,
+            'ok': p50 <= args.startup_budget and not selenium_loaded
+        })
+    return results
+
+
+def format_seconds(value):
+    return f"{value:.2f}" if value is not None else "-"
+
+
+def print_results(results, unlock_result, startup_results, startup_budget):
+    print(f"\n🚦 Startup (budget {startup_budget * 1000:.0f} ms):")
+    for result in startup_results:
+        status = "✓" if result['ok'] else "❌"
+        note = ", loaded Selenium" if result['selenium_loaded'] else ""
+        print(f"   {result['command']:<12}{result['p50'] * 1000:>6.0f} ms {status}{note}")
+    print(f"\n{'engine':<10}{'seeds':>7}{'ok':>6}{'wall s':>9}{'seeds/min':>11}{'p50 s':>8}{'p95 s':>8}{'max s':>8}{'ovh p50':>9}{'peak RSS':>11}")
+    print("─" * 87)
+    for result in results:
+        print(
+            f"{result['engine']:<10}{result['seeds']:>7}{result['ok']:>6}{result['wall']:>9.2f}"
+            f"{result['seeds_per_minute']:>11.1f}{format_seconds(result['p50']):>8}{format_seconds(result['p95']):>8}"
+            f"{format_seconds(result['max']):>8}{format_seconds(result['overhead_p50']):>9}"
+            f"{result['peak_rss'] / (1024 * 1024):>9.0f}MB"
+        )
+    if unlock_result:
+        status = "✓" if unlock_result['ok'] else "❌"
+        print(f"\n🔓 Spoiler unlock ({unlock_result['seed_id']}): {status} {unlock_result['wall']:.2f} s, peak RSS {unlock_result['peak_rss'] / (1024 * 1024):.0f}MB")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark maprandogen.py against a local mock Map Randomizer server.')
+    parser.add_argument('-i', '--input', required=True, help='Original Super Metroid ROM file')
+    parser.add_argument('-e', '--engines', default='selenium,http', help='Comma-separated engines to benchmark (default: selenium,http)')
+    parser.add_argument('-n', '--batches', default='1,10,100', help='Comma-separated batch sizes (default: 1,10,100)')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Workers passed to maprandogen.py (default: 1)')
+    parser.add_argument('-b', '--browser', choices=['chrome', 'firefox'], default='chrome', help='Browser for the selenium engine (default: chrome)')
+    parser.add_argument('--lean', action='store_true', help='Pass --lean to the selenium runs')
+    parser.add_argument('--latency', type=float, default=1.0, help='Mean artificial generation latency in seconds (default: 1.0)')
+    parser.add_argument('--jitter', type=float, default=0.25, help='Uniform jitter around the latency in seconds (default: 0.25)')
+    parser.add_argument('--payload-size', type=int, default=ROM_SIZE, help=f'Size of the returned ROM in bytes (default: {ROM_SIZE})')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of generations the mock server fails with a 503 (default: 0)')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET, help=f'Fail if -l or an invalid -s takes longer than this many seconds (default: {STARTUP_BUDGET})')
+    parser.add_argument('--json', metavar='FILE', help='Also write the results as JSON to FILE')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated ROMs and traces')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print maprandogen.py output for failed runs')
+    args = parser.parse_args()
+    args.input = os.path.abspath(args.input)
+
+    engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+    batches = [int(count) for count in args.batches.split(',')]
+    server = MockMaprandoServer(latency=args.latency, jitter=args.jitter, payload_size=args.payload_size, error_rate=args.error_rate).start()
+    args.base_url = server.base_url
+    work_dir = tempfile.mkdtemp(prefix='maprandogen-bench-')
+    preset_path = os.path.join(work_dir, 'Benchmark.json')
+    with open(preset_path, 'w') as f:
+        json.dump(BENCHMARK_PRESET, f)
+
+    startup_results = run_startup(args)
+    print(f"🧪 Mock server on {server.base_url} (latency {args.latency:.2f} ± {args.jitter:.2f} s, payload {args.payload_size} bytes, error rate {args.error_rate:.0%})")
+    results = []
+    unlock_result = None
+    try:
+        for engine in engines:
+            for count in batches:
+                print(f"⏱️  {engine}: {count} seed(s)...", end="", flush=True)
+                result = run_batch(args, server, engine, count, work_dir, preset_path)
+                results.append(result)
+                print(f" {result['ok']}/{count} in {result['wall']:.1f} s")
+                if engine == 'selenium' and unlock_result is None:
+                    unlock_result = run_unlock(args, result['output_dir'])
+    finally:
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results, unlock_result, startup_results, args.startup_budget)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'unlock': unlock_result, 'startup': startup_results}, f, indent=2)
+    if args.keep:
+        print(f"📂 Output kept in: {work_dir}\n")
+    failed = (
+        any(result['returncode'] != 0 for result in results) or (unlock_result and not unlock_result['ok'])
+        or not all(result['ok'] for result in startup_results)
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,125 @@
-import selenium
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select
 import time
 import random
 import json
+import re
 import argparse
 import os
 import hashlib
+import base64
 import urllib.request
+import urllib.parse
+import html
+import http.client
+import http.server
+import socketserver
+import secrets
+import ctypes
+import ctypes.util
+import select
+import concurrent.futures
+import contextlib
+import math
+import queue
+import threading
+import dataclasses
+import tempfile
+import sqlite3
+import mmap
+import zlib
+import sys
 
-parser = argparse.ArgumentParser(
-    description='Automatically generate randomized Super Metroid ROMs.',
-    formatter_class=argparse.RawDescriptionHelpFormatter,
-    usage='%(prog)s [-h] [-l] | [-t TOKEN [-b BROWSER]] | [-i INPUT] [-p PRESET] [-o OUTPUT] [-g GENERATE] [-r] [-s SPRITE] [-c COLOR] [-b BROWSER]'
-)
-parser.add_argument('-p', '--preset', help='JSON preset file, preset name, or comma-separated list for multiple seeds')
-parser.add_argument('-i', '--input', help='Original Super Metroid ROM file')
-parser.add_argument('-o', '--output', help='Output directory for generated ROM (default: current directory)')
-parser.add_argument('-g', '--generate', type=int, default=1, help='Number of seeds to generate (default: 1)')
-parser.add_argument('-r', '--random', action='store_true', help='Randomize Samus sprite and E-Tank color for each seed')
-parser.add_argument('-s', '--sprite', help='Specify Samus sprite (use a valid sprite name)')
-parser.add_argument('-c', '--color', help='Specify E-Tank color (use a valid hex code)')
-parser.add_argument('-b', '--browser', choices=['chrome', 'firefox'], default='chrome', help='Browser to use (default: chrome)')
-parser.add_argument('-t', '--token', help='Seed ID or URL to unlock spoiler map')
-parser.add_argument('-l', '--list', action='store_true', help='List all available Samus sprites and E-Tank colors')
-args = parser.parse_args()
-
-def get_random_user_agent():
+DEFAULT_BASE_URL = "https://maprando.com"
+
+USER_AGENTS_URL = "https://jnrbsn.github.io/user-agents/user-agents.json"
+FALLBACK_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36"
+USER_AGENTS_TTL = 7 * 24 * 60 * 60
+
+def get_cache_dir():
+    if os.name == 'nt':
+        base_dir = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    else:
+        base_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base_dir, 'maprandogen')
+
+def read_cache_file(name):
     try:
-        url = "https://jnrbsn.github.io/user-agents/user-agents.json"
-        with urllib.request.urlopen(url, timeout=5) as response:
-            user_agents = json.loads(response.read().decode())
-            return random.choice(user_agents)
-    except Exception as e:
-        return "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36"
+        with open(os.path.join(get_cache_dir(), name), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_json_atomic(path, data, durable=False):
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_cache_file(name, data):
+    try:
+        cache_dir = get_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+        write_json_atomic(os.path.join(cache_dir, name), data)
+    except OSError:
+        pass
+
+user_agents = None
+user_agents_lock = threading.Lock()
+
+def fetch_user_agents():
+    try:
+        with urllib.request.urlopen(USER_AGENTS_URL, timeout=5) as response:
+            agents = json.loads(response.read().decode())
+    except Exception:
+        agents = []
+    if agents or not (read_cache_file('user-agents.json') or {}).get('user_agents'):
+        write_cache_file('user-agents.json', {'fetched': time.time(), 'user_agents': agents})
+    return agents
+
+def refresh_user_agents():
+    global user_agents
+    agents = fetch_user_agents()
+    if agents:
+        with user_agents_lock:
+            user_agents = agents
+
+def get_random_user_agent(offline=False):
+    global user_agents
+    with user_agents_lock:
+        if user_agents is None:
+            cached = read_cache_file('user-agents.json')
+            if cached is not None:
+                user_agents = cached.get('user_agents') or []
+                if not offline and time.time() - cached.get('fetched', 0) > USER_AGENTS_TTL:
+                    threading.Thread(target=refresh_user_agents, daemon=True).start()
+            elif offline:
+                user_agents = []
+            else:
+                user_agents = fetch_user_agents()
+        agents = user_agents
+    if agents:
+        return random.choice(agents)
+    return FALLBACK_USER_AGENT
 
-def get_browser_driver(browser_type, download_path=None):
-    user_agent = get_random_user_agent()
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.mp3", "*.ogg", "*.wav", "*.mp4", "*.webm",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*", "*google-analytics.com*", "*googletagmanager.com*",
+    "*doubleclick.net*", "*cloudflareinsights.com*", "*plausible.io*"
+]
+
+def get_browser_cache_dir(browser_type, slot=1):
+    return os.path.join(get_cache_dir(), 'browser-cache', f"{browser_type}-{slot}")
+
+def get_browser_driver(browser_type, download_path=None, offline=False, lean=False, cache_dir=None):
+    from selenium import webdriver
+    user_agent = get_random_user_agent(offline)
     abs_download_path = os.path.abspath(download_path) if download_path else os.path.abspath(os.getcwd())   
     if browser_type == 'firefox':
+        from selenium.webdriver.firefox.options import Options as FirefoxOptions
         options = FirefoxOptions()
         options.add_argument("--headless")
         options.add_argument("--width=1920")
@@ -55,8 +131,38 @@ def get_browser_driver(browser_type, download_path=None):
             options.set_preference("browser.download.useDownloadDir", True)
             options.set_preference("browser.download.manager.showWhenStarting", False)
             options.set_preference("browser.helperApps.neverAsk.saveToDisk", "application/x-snes-rom,application/octet-stream")
+        if lean:
+            for name, value in {
+                "permissions.default.image": 2,
+                "gfx.downloadable_fonts.enabled": False,
+                "browser.display.use_document_fonts": 0,
+                "media.autoplay.default": 5,
+                "privacy.trackingprotection.enabled": True,
+                "network.prefetch-next": False,
+                "network.dns.disablePrefetch": True,
+                "network.http.speculative-parallel-limit": 0,
+                "network.captive-portal-service.enabled": False,
+                "network.connectivity-service.enabled": False,
+                "browser.safebrowsing.malware.enabled": False,
+                "browser.safebrowsing.phishing.enabled": False,
+                "browser.safebrowsing.downloads.enabled": False,
+                "app.update.auto": False,
+                "app.normandy.enabled": False,
+                "extensions.update.enabled": False,
+                "extensions.getAddons.cache.enabled": False,
+                "datareporting.policy.dataSubmissionEnabled": False,
+                "toolkit.telemetry.enabled": False,
+                "browser.newtabpage.enabled": False,
+                "browser.startup.page": 0
+            }.items():
+                options.set_preference(name, value)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                options.set_preference("browser.cache.disk.enable", True)
+                options.set_preference("browser.cache.disk.parent_directory", cache_dir)
         return webdriver.Firefox(options=options)
     else:
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
         options = ChromeOptions()
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-gpu")
@@ -70,85 +176,70 @@ def get_browser_driver(browser_type, download_path=None):
             "download.directory_upgrade": True,
             "safebrowsing.enabled": False
         }
+        if lean:
+            for argument in [
+                "--blink-settings=imagesEnabled=false", "--disable-background-networking", "--disable-extensions",
+                "--disable-component-update", "--disable-default-apps", "--disable-sync", "--no-first-run",
+                "--mute-audio", "--disable-features=Translate,OptimizationHints,MediaRouter,InterestFeedContentSuggestions"
+            ]:
+                options.add_argument(argument)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                options.add_argument(f"--disk-cache-dir={cache_dir}")
+            prefs["profile.managed_default_content_settings.images"] = 2
         options.add_experimental_option("prefs", prefs)
-        return webdriver.Chrome(options=options)
-
-samus_sprites = [
-    "samus_vanilla", "samus_dread", "dread_samus", "santamus", "metroid_1_suit", "metroid_suit",
-    "samus_fusion_typea_green", "dark_samus", "dark_samus_2", "dark_samus_reanimated",
-    "samus_zero-mission", "samus_returns", "samus_maid", "hack_opposition", "ped_suit",
-    "ascent", "ancient_chozo", "super_duper", "samus_clocktoberfest", "samus_aroace",
-    "samus_aroace_2", "samus_enby", "samus_trans", "samus_agender", "samus_blue",
-    "samus_greyscale", "alcoon", "alucard_sotn", "arcana", "bailey", "bob", "brad_fang",
-    "bruno", "buffed_kirby", "buffed_eggplant", "buffed_pug", "cacodemon", "captain_novolin",
-    "ceroba_ketsukane", "chairdeep", "charizard", "charlotte_aran", "crest", "crewmate",
-    "cuphead", "cursor", "diddy_kong", "earthworm_jim", "fedtrooper", "fight", "goku_child",
-    "infee_nitee", "inkling-girl", "junko", "katt_aran", "kiara", "kiara_idol", "king_of_pop", "kirby",
-    "kirby_yarn", "knuckles", "link_2_the_past", "link_oot", "link_tall", "luigi_mansion",
-    "lyn", "maddie_and_baddie", "marga", "maria_pollo", "maria_renard", "mario_8bit", "mario_8bit_modern",
-    "mario_dreamteam", "mario_smw", "master_hand", "maxim_kischine", "megamanx",
-    "megamanx_bearded", "metroid", "modul", "moonclif", "officer_donut", "onefourty",
-    "plissken", "protogen_laso", "pyronett", "pyronett_a", "richter_belmont",
-    "ronald_mcdonald", "samus_combatarmor", "sans", "shantae", "shaktool", "shaktool-jr",
-    "snes_controller", "sonic", "advance_sonic", "space_pirate", "sprite_can", "super_controid_pg", "tails",
-    "tetris", "terrifier", "thomcrow_corbin", "wario", "yoshi", "zero_suit_samus", "samus_outline",
-    "hitboxhelper2", "samus_backwards", "samus_upsidedown", "samus_180-degree", "samus_mini",
-    "samus_left-leg", "samus_cannon", "samus_invisible"
-]
+        driver = webdriver.Chrome(options=options)
+        if lean:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+        return driver
 
-sprite_names = {
+samus_sprites = {
     "samus_vanilla": "Samus", "samus_dread": "Dread Samus (Super)", "dread_samus": "Dread Samus",
-    "santamus": "Santamus", "metroid_1_suit": "Metroid 1 Samus", "metroid_suit": "Metroid Suit Samus", "samus_fusion_typea_green": "Fusion Samus",
-    "dark_samus": "Dark Samus", "dark_samus_2": "Dark Samus 2", "dark_samus_reanimated": "Dark Samus Reanimated",
-    "samus_zero-mission": "Zero Mission Samus", "samus_returns": "Samus Returns Samus", "samus_maid": "Samus Maid",
-    "hack_opposition": "Opposition Samus", "ped_suit": "PED Suit Samus", "ascent": "Ascent Samus",
-    "ancient_chozo": "Ancient Chozo Samus", "super_duper": "Super Duper Samus", "samus_clocktoberfest": "Clocktoberfest Samus",
+    "santamus": "Santamus", "metroid_1_suit": "Metroid 1 Samus", "metroid_suit": "Metroid Suit Samus",
+    "samus_fusion_typea_green": "Fusion Samus", "dark_samus": "Dark Samus", "dark_samus_2": "Dark Samus 2",
+    "dark_samus_reanimated": "Dark Samus Reanimated", "samus_zero-mission": "Zero Mission Samus",
+    "samus_returns": "Samus Returns Samus", "samus_maid": "Samus Maid", "hack_opposition": "Opposition Samus",
+    "ped_suit": "PED Suit Samus", "ascent": "Ascent Samus", "ancient_chozo": "Ancient Chozo Samus",
+    "super_duper": "Super Duper Samus", "samus_clocktoberfest": "Clocktoberfest Samus",
     "samus_aroace": "Aroace Samus (Old)", "samus_aroace_2": "Aroace Samus (New)", "samus_enby": "Enby Samus",
     "samus_trans": "Trans Samus", "samus_agender": "Agender Samus", "samus_blue": "Blue Samus",
-    "samus_greyscale": "Greyscale Samus", "alcoon": "Alcoon", "alucard_sotn": "Alucard",
-    "arcana": "Arcana", "bailey": "Justin Bailey", "bob": "B.O.B.", "brad_fang": "Brad Fang",
-    "bruno": "Bruno", "buffed_kirby": "Buffed Kirby", "buffed_eggplant": "Buffed Eggplant",
-    "buffed_pug": "Buffed Pug", "cacodemon": "Cacodemon", "captain_novolin": "Captain Novolin",
-    "ceroba_ketsukane": "Ceroba Ketsukane", "chairdeep": "Chairdeep", "charizard": "Charizard",
-    "charlotte_aran": "Charlotte Aran", "crest": "Crest", "crewmate": "Crewmate",
-    "cuphead": "Cuphead", "cursor": "Cursor", "diddy_kong": "Diddy Kong",
+    "samus_greyscale": "Greyscale Samus", "alcoon": "Alcoon", "alucard_sotn": "Alucard", "arcana": "Arcana",
+    "bailey": "Justin Bailey", "bob": "B.O.B.", "brad_fang": "Brad Fang", "bruno": "Bruno",
+    "buffed_kirby": "Buffed Kirby", "buffed_eggplant": "Buffed Eggplant", "buffed_pug": "Buffed Pug",
+    "cacodemon": "Cacodemon", "captain_novolin": "Captain Novolin", "ceroba_ketsukane": "Ceroba Ketsukane",
+    "chairdeep": "Chairdeep", "charizard": "Charizard", "charlotte_aran": "Charlotte Aran", "crest": "Crest",
+    "crewmate": "Crewmate", "cuphead": "Cuphead", "cursor": "Cursor", "diddy_kong": "Diddy Kong",
     "earthworm_jim": "Earthworm Jim", "fedtrooper": "Galactic Federation Trooper", "fight": "Fight",
-    "goku_child": "Goku (Child)", "infee_nitee": "Infee and Nitee", "inkling-girl": "Inkling Girl",
-    "junko": "Junko", "katt_aran": "Katt Aran", "kiara": "Kiara", "kiara_idol": "Idol Kiara", "king_of_pop": "The King of Pop",
-    "kirby": "Kirby", "kirby_yarn": "Kirby (Yarn)", "knuckles": "Knuckles",
-    "link_2_the_past": "Link 2 the Past", "link_oot": "Link (OoT)", "link_tall": "Link (Z2)",
-    "luigi_mansion": "Luigi", "lyn": "Lyn", "maddie_and_baddie": "Maddie and Baddie", "marga": "Alice Margatroid",
-    "maria_pollo": "Maria Pollo", "maria_renard": "Maria Renard", "mario_8bit": "Mario (NES)",
-    "mario_8bit_modern": "Mario (NES, Modern colors)", "mario_dreamteam": "Mario (Dream Team)",
-    "mario_smw": "Mario (SMW)", "master_hand": "Master Hand", "maxim_kischine": "Maxim Kischine",
-    "megamanx": "Mega Man X", "megamanx_bearded": "Mega Man X (Bearded)", "metroid": "Metroid",
-    "modul": "Modul", "moonclif": "Moonclif", "officer_donut": "Officer Donut",
-    "onefourty": "140", "plissken": "Plissken", "protogen_laso": "Protogen Laso",
-    "pyronett": "Pyronett", "pyronett_a": "Pyronett (Recolor)", "richter_belmont": "Richter Belmont",
-    "ronald_mcdonald": "Ronald McDonald", "samus_combatarmor": "Combat Armor Samus", "sans": "Sans",
-    "shantae": "Shantae", "shaktool": "Shaktool", "shaktool-jr": "Shaktool Jr.",
-    "snes_controller": "SNES Controller", "sonic": "Sonic the Hedgehog", "advance_sonic": "Sonic Advance", "space_pirate": "Space Pirate",
-    "sprite_can": "Sprite Can", "super_controid_pg": "Super Controid", "tails": "Tails",
-    "tetris": "Tetromino", "terrifier": "Terrifier", "thomcrow_corbin": "Thomcrow Corbin", "wario": "Wario",
-    "yoshi": "Yoshi & Baby Mario", "zero_suit_samus": "Zero Suit Samus", "samus_outline": "Outline Samus",
-    "hitboxhelper2": "Hitbox Helper", "samus_backwards": "Backwards Samus", "samus_upsidedown": "Upside-Down Samus",
+    "goku_child": "Goku (Child)", "infee_nitee": "Infee and Nitee", "inkling-girl": "Inkling Girl", "junko": "Junko",
+    "katt_aran": "Katt Aran", "kiara": "Kiara", "kiara_idol": "Idol Kiara", "king_of_pop": "The King of Pop",
+    "kirby": "Kirby", "kirby_yarn": "Kirby (Yarn)", "knuckles": "Knuckles", "link_2_the_past": "Link 2 the Past",
+    "link_oot": "Link (OoT)", "link_tall": "Link (Z2)", "luigi_mansion": "Luigi", "lyn": "Lyn",
+    "maddie_and_baddie": "Maddie and Baddie", "marga": "Alice Margatroid", "maria_pollo": "Maria Pollo",
+    "maria_renard": "Maria Renard", "mario_8bit": "Mario (NES)", "mario_8bit_modern": "Mario (NES, Modern colors)",
+    "mario_dreamteam": "Mario (Dream Team)", "mario_smw": "Mario (SMW)", "master_hand": "Master Hand",
+    "maxim_kischine": "Maxim Kischine", "megamanx": "Mega Man X", "megamanx_bearded": "Mega Man X (Bearded)",
+    "metroid": "Metroid", "modul": "Modul", "moonclif": "Moonclif", "officer_donut": "Officer Donut",
+    "onefourty": "140", "plissken": "Plissken", "protogen_laso": "Protogen Laso", "pyronett": "Pyronett",
+    "pyronett_a": "Pyronett (Recolor)", "richter_belmont": "Richter Belmont", "ronald_mcdonald": "Ronald McDonald",
+    "samus_combatarmor": "Combat Armor Samus", "sans": "Sans", "shantae": "Shantae", "shaktool": "Shaktool",
+    "shaktool-jr": "Shaktool Jr.", "snes_controller": "SNES Controller", "sonic": "Sonic the Hedgehog",
+    "advance_sonic": "Sonic Advance", "space_pirate": "Space Pirate", "sprite_can": "Sprite Can",
+    "super_controid_pg": "Super Controid", "tails": "Tails", "tetris": "Tetromino", "terrifier": "Terrifier",
+    "thomcrow_corbin": "Thomcrow Corbin", "wario": "Wario", "yoshi": "Yoshi & Baby Mario",
+    "zero_suit_samus": "Zero Suit Samus", "samus_outline": "Outline Samus", "hitboxhelper2": "Hitbox Helper",
+    "samus_backwards": "Backwards Samus", "samus_upsidedown": "Upside-Down Samus",
     "samus_180-degree": "180-Degree Samus", "samus_mini": "Mini Samus", "samus_left-leg": "Left Leg Samus",
     "samus_cannon": "Samus Cannon", "samus_invisible": "Invisible Samus"
 }
 
-etank_colors = [
-    "de3894", "de3843", "de8038", "ded338", "96de38", "43de38", "38de80", "38ded3",
-    "3896de", "3843de", "8038de", "d338de", "de8cba", "de8c91", "deaf8c", "ded98c",
-    "bade8c", "91de8c", "8cdeaf", "8cded9", "8cbade", "8c91de", "af8cde", "d98cde"
-]
-
-color_names = {
-    "de3894": "Intense Pink", "de3843": "Bright Red", "de8038": "Orange", "ded338": "Yellow",
-    "96de38": "Lime Green", "43de38": "Bright Green", "38de80": "Aqua Green", "38ded3": "Cyan",
-    "3896de": "Sky Blue", "3843de": "Intense Blue", "8038de": "Purple", "d338de": "Magenta",
-    "de8cba": "Pastel Pink", "de8c91": "Salmon Pink", "deaf8c": "Peach", "ded98c": "Pastel Yellow",
-    "bade8c": "Pastel Green", "91de8c": "Mint Green", "8cdeaf": "Pastel Aqua", "8cded9": "Pastel Cyan",
-    "8cbade": "Pastel Azure", "8c91de": "Lavender", "af8cde": "Lilac", "d98cde": "Pink Purple"
+etank_colors = {
+    "de3894": "Intense Pink", "de3843": "Bright Red", "de8038": "Orange", "ded338": "Yellow", "96de38": "Lime Green",
+    "43de38": "Bright Green", "38de80": "Aqua Green", "38ded3": "Cyan", "3896de": "Sky Blue", "3843de": "Intense Blue",
+    "8038de": "Purple", "d338de": "Magenta", "de8cba": "Pastel Pink", "de8c91": "Salmon Pink", "deaf8c": "Peach",
+    "ded98c": "Pastel Yellow", "bade8c": "Pastel Green", "91de8c": "Mint Green", "8cdeaf": "Pastel Aqua",
+    "8cded9": "Pastel Cyan", "8cbade": "Pastel Azure", "8c91de": "Lavender", "af8cde": "Lilac",
+    "d98cde": "Pink Purple"
 }
 
 other_values = {
@@ -169,26 +260,31 @@ other_values = {
     "transition_letters": "true", "vanilla_screw_attack_animation": "false"
 }
 
-if args.list:
-    print("\n╔════════════════════════╗")
-    print("║  Sprites and Colors    ║")
-    print("╚════════════════════════╝\n")
-    print("SAMUS SPRITES:")
-    print("─" * 70)
-    max_display_len = max(len(name) for name in sprite_names.values())
-    for sprite_id in samus_sprites:
-        display_name = sprite_names.get(sprite_id, sprite_id)
-        padding = max_display_len - len(display_name)
-        print(f"  {display_name}{' ' * padding}  =  {sprite_id}")
-    print("\n\nE-TANK COLORS:")
-    print("─" * 70)
-    max_color_len = max(len(name) for name in color_names.values())
-    for color_id in etank_colors:
-        display_name = color_names.get(color_id, color_id)
-        padding = max_color_len - len(display_name)
-        print(f"  {display_name}{' ' * padding}  =  {color_id}")
-    print("\n")
-    exit(0)
+def track_requests(driver):
+    driver.execute_script("""
+        if (window.maprandogenPending !== undefined) {
+            return;
+        }
+        window.maprandogenPending = 0;
+        const settle = () => { window.maprandogenPending--; };
+        const fetch = window.fetch;
+        window.fetch = function () {
+            window.maprandogenPending++;
+            return fetch.apply(this, arguments).finally(settle);
+        };
+        const send = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function () {
+            window.maprandogenPending++;
+            this.addEventListener('loadend', settle, {once: true});
+            return send.apply(this, arguments);
+        };
+    """)
+
+def wait_for_idle(driver, timeout=5):
+    from selenium.webdriver.support.ui import WebDriverWait
+    WebDriverWait(driver, timeout).until(
+        lambda d: d.execute_script("return document.readyState === 'complete' && !window.maprandogenPending")
+    )
 
 def check_race_mode_from_page(driver):
     try:
@@ -211,13 +307,13 @@ def get_spoiler_token(driver):
     except:
         return None
 
-def save_spoiler_token(output_dir, seed_id, token):
+def save_spoiler_token(output_dir, seed_id, token, base_url=DEFAULT_BASE_URL):
     try:
         filename = f"SpoilerToken_{seed_id}.txt"
         filepath = os.path.join(output_dir, filename)
         with open(filepath, 'w') as f:
             f.write(f"Spoiler Token: {token}\n")
-            f.write(f"URL: https://maprando.com/seed/{seed_id}\n")
+            f.write(f"URL: {base_url}/seed/{seed_id}\n")
         return filepath
     except Exception as e:
         print(f"   ⚠️ Warning: Could not save spoiler token to file: {e}")
@@ -229,321 +325,857 @@ def clear_spoiler_token(driver):
     except:
         pass
 
-if args.token:
-    if any([args.input, args.preset, args.output, args.generate != 1, args.random, args.sprite, args.color]):
-        parser.error("-t/--token cannot be used with other generation arguments")
-    print("\n╔═════════════════════════╗")
-    print("║  Spoiler Map Unlocker   ║")
-    print("╚═════════════════════════╝\n")
-    seed_input = args.token.strip()
-    if seed_input.startswith('http'):
-        if '/seed/' not in seed_input:
-            parser.error("Invalid seed URL format. Expected: https://maprando.com/seed/XXXXXXXXX or just the seed ID")
-        seed_id = seed_input.rstrip('/').split('/seed/')[-1].split('/')[0].split('?')[0]
-    else:
-        seed_id = seed_input
-    seed_url = f"https://maprando.com/seed/{seed_id}/"
-    print(f"🔑 Seed ID: {seed_id}")
-    spoiler_token_from_file = None
-    token_file_pattern = f"SpoilerToken_{seed_id}.txt"
-    search_directories = [os.getcwd()]
-    if args.output:
-        search_dir = os.path.abspath(args.output)
-        if os.path.exists(search_dir):
-            search_directories.insert(0, search_dir)
-    for search_dir in search_directories:
-        token_file_path = os.path.join(search_dir, token_file_pattern)
-        if os.path.exists(token_file_path):
-            try:
-                with open(token_file_path, 'r') as f:
-                    for line in f:
-                        if line.startswith('Spoiler Token:'):
-                            spoiler_token_from_file = line.split('Spoiler Token:')[1].strip()
-                            break
-                if spoiler_token_from_file:
-                    print(f"📄 Found token file: {token_file_pattern}")
-                    break
-            except Exception as e:
-                pass
-    driver = get_browser_driver(args.browser)
-    try:
-        print("🌐 Connecting to seed page...", end="", flush=True)
-        driver.get(seed_url)
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        print(" ✓")
-        if spoiler_token_from_file:
-            print(f"🔓 Using token from file")
-            spoiler_token_input = spoiler_token_from_file
-        else:
-            spoiler_token_input = input("🔐 Enter spoiler token: ").strip()
-            if not spoiler_token_input:
-                print("❌ Error: Spoiler token cannot be empty")
-                driver.quit()
-                exit(1)
-        print("🔑 Setting spoiler token...", end="", flush=True)
-        driver.execute_script(f"localStorage.setItem('spoilerToken', '{spoiler_token_input}');")
-        print(" ✓")
-        print("🔄 Reloading page...", end="", flush=True)
-        driver.refresh()
-        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-        time.sleep(0.5)
-        print(" ✓")
-        print("🔓 Unlocking spoiler data...", end="", flush=True)
-        result = driver.execute_script("""
-            return new Promise((resolve) => {
-                const token = localStorage.getItem('spoilerToken');
-                if (!token) {
-                    resolve({
-                        success: false,
-                        error: 'No spoiler token found in localStorage'
-                    });
-                    return;
-                }
-                const unlockForm = document.getElementById('unlockForm');
-                if (!unlockForm) {
-                    resolve({
-                        success: false,
-                        error: 'Unlock button not found - seed may not be in race mode'
-                    });
-                    return;
-                }
-                unlockForm.style.display = 'flex';
-                const submitButton = unlockForm.querySelector('input[type="submit"]');
-                if (submitButton) {
-                    submitButton.click();
-                } else {
-                    unlockForm.submit();
-                }
-                setTimeout(() => {
-                    const checkResult = setInterval(() => {
-                        const visualizerLink = document.querySelector('a[href*="visualizer"]');
-                        if (visualizerLink) {
-                            clearInterval(checkResult);
-                            resolve({
-                                success: true,
-                                visualizerUrl: visualizerLink.href,
-                                linkText: visualizerLink.textContent.trim()
-                            });
-                        }
-                    }, 500);
-                    setTimeout(() => {
-                        clearInterval(checkResult);
-                        const visualizerLink = document.querySelector('a[href*="visualizer"]');
-                        if (visualizerLink) {
-                            resolve({
-                                success: true,
-                                visualizerUrl: visualizerLink.href,
-                                linkText: visualizerLink.textContent.trim()
-                            });
-                        } else {
-                            resolve({
-                                success: false,
-                                error: 'Visualizer link not found after unlock'
-                            });
-                        }
-                    }, 5000);
-                }, 100);
-            });
-        """)
-        print(" ✓")
-        if result.get('success'):
-            visualizer_url = result.get('visualizerUrl')
-            print(f"\n✅ Success! Spoiler map unlocked")
-            print(f"🗺️  Interactive Map URL:")
-            print(f"   {visualizer_url}\n")
-        else:
-            error_msg = result.get('error', 'Unknown error')
-            print(f" ❌")
-            print(f"\n❌ Error: {error_msg}")
-            print("   The token may be invalid or the seed may not be in race mode\n")
-    except Exception as e:
-        print(f" ❌")
-        print(f"\n❌ Error: {str(e)}\n")
-    finally:
-        driver.quit()
-    exit(0)
-
 EXPECTED_ROM_HASH = "12b77c4bc9c1832cee8881244659065ee1d84c70c3d29e6eaf92e6798cc2ca72"
 
-def verify_rom_hash(file_path):
-    sha256_hash = hashlib.sha256()
+def hash_file(file_path):
     with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha256_hash = hashlib.sha256()
+        for byte_block in iter(lambda: f.read(1024 * 1024), b""):
             sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+        return sha256_hash.hexdigest()
+
+def verify_rom_hash(file_path):
+    abs_path = os.path.abspath(file_path)
+    stat = os.stat(abs_path)
+    file_key = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+    rom_hashes = read_cache_file('rom-hashes.json') or {}
+    cached = rom_hashes.get(abs_path)
+    if cached and cached.get('key') == file_key:
+        return cached['sha256']
+    digest = hash_file(abs_path)
+    rom_hashes[abs_path] = {'key': file_key, 'sha256': digest}
+    write_cache_file('rom-hashes.json', rom_hashes)
+    return digest
+
+def check_rom_hash(input_rom_hash):
+    if input_rom_hash != EXPECTED_ROM_HASH:
+        print(f"❌ ERROR: ROM hash mismatch!")
+        print(f"   Expected: {EXPECTED_ROM_HASH}")
+        print(f"   Got:      {input_rom_hash}")
+        print(f"   Please provide a valid Super Metroid ROM.\n")
+        return False
+    print(f"✓ ROM verified\n")
+    return True
+
+class BpsError(Exception):
+    pass
+
+BPS_MIN_MATCH = 4
+BPS_BLOCK = 256
+BPS_COPY_BLOCK = 32
+BPS_RUN = re.compile(rb'(.)\1{15,}', re.S)
+
+def bps_number(value):
+    encoded = bytearray()
+    while True:
+        low = value & 0x7f
+        value >>= 7
+        if value == 0:
+            encoded.append(0x80 | low)
+            return encoded
+        encoded.append(low)
+        value -= 1
+
+def bps_read_number(data, position):
+    value, shift = 0, 1
+    while True:
+        byte = data[position]
+        position += 1
+        value += (byte & 0x7f) * shift
+        if byte & 0x80:
+            return value, position
+        shift <<= 7
+        value += shift
+
+def bps_source_index(source):
+    source = memoryview(source)
+    index = {}
+    for offset in range(0, len(source) - BPS_COPY_BLOCK + 1, BPS_COPY_BLOCK):
+        index.setdefault(source[offset:offset + BPS_COPY_BLOCK].tobytes(), offset)
+    return index
+
+def bps_encode(source, target, metadata=b"", source_index=None):
+    if source_index is None:
+        source_index = bps_source_index(source)
+    source = memoryview(source)
+    target = memoryview(target)
+    patch = bytearray(b"BPS1")
+    patch += bps_number(len(source)) + bps_number(len(target)) + bps_number(len(metadata)) + metadata
+    overlap = min(len(source), len(target))
+    target_relative = 0
+    source_relative = 0
+
+    def target_read(start, end):
+        nonlocal target_relative
+        while start < end:
+            run = BPS_RUN.search(target, start, end)
+            literal_end = run.start() + 1 if run else end
+            patch.extend(bps_number(((literal_end - start - 1) << 2) | 1))
+            patch.extend(target[start:literal_end])
+            if not run:
+                return
+            delta = run.start() - target_relative
+            patch.extend(bps_number(((run.end() - literal_end - 1) << 2) | 3))
+            patch.extend(bps_number((abs(delta) << 1) | (delta < 0)))
+            target_relative = run.end() - 1
+            start = run.end()
+
+    def changed(start, end):
+        nonlocal source_relative
+        literal_start = position = start
+        while position + BPS_COPY_BLOCK <= end:
+            offset = source_index.get(target[position:position + BPS_COPY_BLOCK].tobytes())
+            if offset is None:
+                position += 1
+                continue
+            while position > literal_start and offset > 0 and source[offset - 1] == target[position - 1]:
+                position -= 1
+                offset -= 1
+            shift = offset - position
+            copy_end = position
+            while copy_end + BPS_BLOCK <= end and copy_end + shift + BPS_BLOCK <= len(source) and \
+                    source[copy_end + shift:copy_end + shift + BPS_BLOCK] == target[copy_end:copy_end + BPS_BLOCK]:
+                copy_end += BPS_BLOCK
+            while copy_end < end and copy_end + shift < len(source) and source[copy_end + shift] == target[copy_end]:
+                copy_end += 1
+            target_read(literal_start, position)
+            delta = offset - source_relative
+            patch.extend(bps_number(((copy_end - position - 1) << 2) | 2))
+            patch.extend(bps_number((abs(delta) << 1) | (delta < 0)))
+            source_relative = copy_end + shift
+            literal_start = position = copy_end
+        target_read(literal_start, end)
+
+    def matches(position, length):
+        return source[position:position + length] == target[position:position + length]
+
+    position = 0
+    while position < overlap:
+        end = position
+        while end + BPS_BLOCK <= overlap and matches(end, BPS_BLOCK):
+            end += BPS_BLOCK
+        while end < overlap and source[end] == target[end]:
+            end += 1
+        if end - position >= BPS_MIN_MATCH or end == overlap:
+            if end > position:
+                patch.extend(bps_number(((end - position - 1) << 2) | 0))
+            position = end
+            continue
+        literal_end = end
+        while literal_end < overlap and not (source[literal_end] == target[literal_end] and matches(literal_end, BPS_MIN_MATCH)):
+            literal_end += 1
+        changed(position, literal_end)
+        position = literal_end
+    changed(position, len(target))
+    patch += zlib.crc32(source).to_bytes(4, 'little') + zlib.crc32(target).to_bytes(4, 'little')
+    patch += zlib.crc32(patch).to_bytes(4, 'little')
+    return bytes(patch)
+
+def bps_sizes(header):
+    position = 4
+    values = []
+    for _ in range(3):
+        value, position = bps_read_number(header, position)
+        values.append(value)
+    source_size, target_size, metadata_size = values
+    return source_size, target_size, metadata_size, position
+
+def bps_metadata(patch_path):
+    with open(patch_path, 'rb') as f:
+        _, _, metadata_size, position = bps_sizes(f.read(64))
+        f.seek(position)
+        return f.read(metadata_size)
+
+def bps_header(patch_view, name):
+    if patch_view[:4] != b"BPS1" or zlib.crc32(patch_view[:-4]) != int.from_bytes(patch_view[-4:], 'little'):
+        raise BpsError(f"'{name}' is not a valid BPS patch")
+    source_size, target_size, metadata_size, position = bps_sizes(patch_view)
+    return source_size, target_size, position + metadata_size
+
+def bps_decode(patch_view, source_view, output, name):
+    source_size, target_size, position = bps_header(patch_view, name)
+    source_crc, target_crc = (int.from_bytes(patch_view[i:i + 4], 'little') for i in (-12, -8))
+    if len(source_view) != source_size or zlib.crc32(source_view) != source_crc:
+        raise BpsError("The base ROM does not match the one this patch was made against")
+
+    def number():
+        nonlocal position
+        value, position = bps_read_number(patch_view, position)
+        return value
 
-def load_preset_file(driver, preset_path):
+    output_offset = source_relative = target_relative = 0
+    end = len(patch_view) - 12
+    while position < end:
+        data = number()
+        action, length = data & 3, (data >> 2) + 1
+        if action == 0:
+            output[output_offset:output_offset + length] = source_view[output_offset:output_offset + length]
+        elif action == 1:
+            output[output_offset:output_offset + length] = patch_view[position:position + length]
+            position += length
+        elif action == 2:
+            offset = number()
+            source_relative += -(offset >> 1) if offset & 1 else offset >> 1
+            output[output_offset:output_offset + length] = source_view[source_relative:source_relative + length]
+            source_relative += length
+        else:
+            offset = number()
+            target_relative += -(offset >> 1) if offset & 1 else offset >> 1
+            distance = output_offset - target_relative
+            if distance >= length:
+                output[output_offset:output_offset + length] = output[target_relative:target_relative + length]
+            else:
+                pattern = output[target_relative:output_offset]
+                output[output_offset:output_offset + length] = (pattern * (length // distance + 1))[:length]
+            target_relative += length
+        output_offset += length
+    if output_offset != target_size or zlib.crc32(output) != target_crc:
+        raise BpsError(f"'{name}' produced a ROM with the wrong checksum")
+
+def bps_apply(source_path, patch_path, output_path):
+    name = os.path.basename(patch_path)
+    with open(patch_path, 'rb') as patch_file, open(source_path, 'rb') as source_file:
+        patch = mmap.mmap(patch_file.fileno(), 0, access=mmap.ACCESS_READ)
+        source = mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with memoryview(patch) as patch_view, memoryview(source) as source_view:
+                _, target_size, _ = bps_header(patch_view, name)
+                part_path = output_path + ".part"
+                with open(part_path, 'w+b') as output_file:
+                    output_file.truncate(target_size)
+                    output = mmap.mmap(output_file.fileno(), target_size)
+                    try:
+                        bps_decode(patch_view, source_view, output, name)
+                        output.flush()
+                    finally:
+                        output.close()
+        except Exception:
+            if os.path.exists(output_path + ".part"):
+                os.remove(output_path + ".part")
+            raise
+        finally:
+            patch.close()
+            source.close()
+    os.replace(output_path + ".part", output_path)
+    return output_path
+
+def store_delta(rom_path, base_rom, metadata, base_index=None):
+    with open(rom_path, 'rb') as f:
+        rom = f.read()
+    patch = bps_encode(base_rom, rom, json.dumps(metadata).encode(), base_index)
+    patch_path = os.path.splitext(rom_path)[0] + ".bps"
+    output = bytearray(len(rom))
+    bps_decode(memoryview(patch), memoryview(base_rom), output, os.path.basename(patch_path))
+    if output != rom:
+        raise BpsError(f"'{os.path.basename(patch_path)}' does not rebuild {os.path.basename(rom_path)}")
+    with open(patch_path + ".part", 'wb') as f:
+        f.write(patch)
+    os.replace(patch_path + ".part", patch_path)
+    os.remove(rom_path)
+    return patch_path, hashlib.sha256(patch).hexdigest()
+
+def diff_ranges(source, target, gap=16, block=4096):
+    if len(source) != len(target):
+        raise ValueError("ROMs differ in size")
+    source, target = memoryview(source), memoryview(target)
+    spans = []
+    for block_start in range(0, len(source), block):
+        block_end = min(block_start + block, len(source))
+        if source[block_start:block_end] == target[block_start:block_end]:
+            continue
+        for i in range(block_start, block_end):
+            if source[i] != target[i]:
+                if spans and i - spans[-1][1] <= gap:
+                    spans[-1][1] = i + 1
+                else:
+                    spans.append([i, i + 1])
+    return [(start, bytes(source[start:end]), bytes(target[start:end])) for start, end in spans]
+
+def swap_cosmetic(rom, remove, add):
+    for offset, old, new in remove:
+        if rom[offset:offset + len(new)] != new:
+            return False
+        rom[offset:offset + len(old)] = old
+    for offset, old, new in add:
+        if rom[offset:offset + len(old)] != old:
+            return False
+        rom[offset:offset + len(new)] = new
+    return True
+
+COSMETIC_PATCHES_TTL = 7 * 24 * 60 * 60
+COSMETIC_LEARN_LIMIT = 2
+
+class CosmeticPatches:
+    FILE = 'cosmetic-patches.json'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        cached = read_cache_file(self.FILE) or {}
+        now = time.time()
+        self.patches = {key: entry for key, entry in cached.items() if now - entry.get('learned', 0) < COSMETIC_PATCHES_TTL}
+
+    def has(self, kind, value):
+        with self.lock:
+            return not value or f"{kind}:{value}" in self.patches
+
+    def get(self, kind, value):
+        if not value:
+            return []
+        with self.lock:
+            entry = self.patches.get(f"{kind}:{value}")
+        if entry is None:
+            return None
+        return [(offset, base64.b64decode(old), base64.b64decode(new)) for offset, old, new in entry['ranges']]
+
+    def learn(self, kind, value, plain_rom, custom_rom):
+        ranges = diff_ranges(plain_rom, custom_rom)
+        with self.lock:
+            self.patches[f"{kind}:{value}"] = {
+                'learned': time.time(),
+                'ranges': [[offset, base64.b64encode(old).decode(), base64.b64encode(new).decode()] for offset, old, new in ranges]
+            }
+            write_cache_file(self.FILE, self.patches)
+        return ranges
+
+def pick_variants(count, exclude=(), cosmetics=None):
+    combos = [(sprite, color) for sprite in samus_sprites for color in etank_colors if (sprite, color) not in exclude]
+    random.shuffle(combos)
+    if cosmetics is None:
+        return combos[:count]
+    known = {('sprite', sprite) for sprite in samus_sprites if cosmetics.has('sprite', sprite)}
+    known |= {('color', color) for color in etank_colors if cosmetics.has('color', color)}
+    picked = []
+    while combos and len(picked) < count:
+        combo = min(combos, key=lambda combo: (('sprite', combo[0]) not in known) + (('color', combo[1]) not in known))
+        combos.remove(combo)
+        picked.append(combo)
+        known |= {('sprite', combo[0]), ('color', combo[1])}
+    return picked
+
+def has_preset_option(driver, preset_name):
+    return driver.execute_script("""
+        const select = document.getElementById('fullSettingsPreset');
+        return !!select && Array.from(select.options).some(option => option.text === arguments[0]);
+    """, preset_name)
+
+def load_preset_file(driver, preset_path, timeout=5):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
     preset_name = os.path.splitext(os.path.basename(preset_path))[0]
-    WebDriverWait(driver, 5).until(
+    WebDriverWait(driver, timeout).until(
         EC.element_to_be_clickable((By.CSS_SELECTOR, "button[data-bs-target='#managePresetsModal']"))
     ).click()
-    WebDriverWait(driver, 5).until(
+    WebDriverWait(driver, timeout).until(
         EC.visibility_of_element_located((By.XPATH, "//h1[contains(text(),'Manage Settings Presets')]"))
     )
     file_input = driver.find_element(By.ID, "importPresetFile")
     file_input.send_keys(os.path.abspath(preset_path))
-    time.sleep(0.5)
-    WebDriverWait(driver, 5).until(
+    WebDriverWait(driver, timeout).until(lambda d: has_preset_option(d, preset_name))
+    WebDriverWait(driver, timeout).until(
         EC.element_to_be_clickable((By.XPATH, "//div[@id='managePresetsModal']//button[contains(text(),'Close')]"))
     ).click()
-    time.sleep(0.3)
+    WebDriverWait(driver, timeout).until(EC.invisibility_of_element_located((By.ID, "managePresetsModal")))
     return preset_name
 
-def select_preset(driver, preset_name):
-    preset_dropdown = WebDriverWait(driver, 5).until(
+def select_preset(driver, preset_name, timeout=5):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support.ui import Select
+    preset_dropdown = WebDriverWait(driver, timeout).until(
         EC.presence_of_element_located((By.ID, "fullSettingsPreset"))
     )
     select = Select(preset_dropdown)
     select.select_by_visible_text(preset_name)
 
-if not args.input:
-    parser.error("the following arguments are required: -i/--input\n\nNote: -l/--list command cannot be used with other arguments.")
+IMPORTED_PRESETS_KEY = 'maprandogen-imported-presets'
 
-if args.sprite and args.sprite not in samus_sprites:
-    parser.error(f"Invalid sprite '{args.sprite}'. Please use a valid sprite name. Use -l to see all available sprites.")
-if args.color and args.color not in etank_colors:
-    parser.error(f"Invalid color '{args.color}'. Please use a valid hex code. Use -l to see all available colors.")
+def find_imported_preset(driver, preset_hash):
+    return driver.execute_script("""
+        const imported = JSON.parse(localStorage.getItem(arguments[1]) || '{}');
+        const name = imported[arguments[0]];
+        const select = document.getElementById('fullSettingsPreset');
+        if (name && select && Array.from(select.options).some(option => option.text === name)) {
+            return name;
+        }
+        return null;
+    """, preset_hash, IMPORTED_PRESETS_KEY)
 
-if args.random and (args.sprite or args.color):
-    parser.error("Cannot use -r/--random with -s/--sprite or -c/--color")
+def remember_imported_preset(driver, preset_hash, preset_name):
+    driver.execute_script("""
+        const imported = JSON.parse(localStorage.getItem(arguments[2]) || '{}');
+        for (const [hash, name] of Object.entries(imported)) {
+            if (name === arguments[1]) {
+                delete imported[hash];
+            }
+        }
+        imported[arguments[0]] = arguments[1];
+        localStorage.setItem(arguments[2], JSON.stringify(imported));
+    """, preset_hash, preset_name, IMPORTED_PRESETS_KEY)
 
-output_dir = os.path.abspath(args.output) if args.output else os.getcwd()
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+PRESET_CATALOG_TTL = 24 * 60 * 60
+PRESET_SELECT = re.compile(r'<select[^>]*id="fullSettingsPreset"[^>]*>(.*?)</select>', re.S)
+PRESET_OPTION = re.compile(r'<option[^>]*>(.*?)</option>', re.S)
 
-preset_list = []
-if args.preset:
-    if ',' in args.preset:
-        preset_list = [p.strip() for p in args.preset.split(',')]
-        if len(preset_list) != args.generate:
-            parser.error(f"Number of presets ({len(preset_list)}) must match number of seeds to generate ({args.generate})")
-    else:
-        preset_list = [args.preset] * args.generate
-else:
-    preset_list = [None] * args.generate
-
-print("\n╔═══════════════════════════╗")
-print("║  Randomap Web Generator   ║")
-print("╚═══════════════════════════╝\n")
-
-print(f"🔍 Verifying input ROM...")
-input_rom_hash = verify_rom_hash(args.input)
-if input_rom_hash != EXPECTED_ROM_HASH:
-    print(f"❌ ERROR: ROM hash mismatch!")
-    print(f"   Expected: {EXPECTED_ROM_HASH}")
-    print(f"   Got:      {input_rom_hash}")
-    print(f"   Please provide a valid Super Metroid ROM.\n")
-    exit(1)
-print(f"✓ ROM verified\n")
-
-driver = get_browser_driver(args.browser, output_dir)
-loaded_preset_files = {}
-
-try:
-    for seed_num in range(1, args.generate + 1):
-        is_first_seed = (seed_num == 1)
-        current_preset = preset_list[seed_num - 1]
-        if args.generate > 1:
-            print(f"[{seed_num}/{args.generate}] ", end="", flush=True)
-        customization_data = other_values.copy()
-        if args.random:
-            selected_sprite = random.choice(samus_sprites)
-            selected_color = random.choice(etank_colors)
-            customization_data['samus_sprite'] = selected_sprite
-            customization_data['etank_color'] = selected_color
-            sprite_display_name = sprite_names.get(selected_sprite, selected_sprite)
-            color_display_name = color_names.get(selected_color, selected_color)
-            if is_first_seed:
-                print(f"🎨 Randomizing customization for each seed")
-            print(f"   👤 Sprite: {sprite_display_name}")
-            print(f"   ❤️ E-Tank Color: {color_display_name}")
-        elif args.sprite or args.color:
-            if args.sprite:
-                customization_data['samus_sprite'] = args.sprite
-                sprite_display_name = sprite_names.get(args.sprite, args.sprite)
-                if is_first_seed:
-                    print(f"🎨 Using custom sprite")
-                    print(f"   👤 Sprite: {sprite_display_name}")
-            if args.color:
-                customization_data['etank_color'] = args.color
-                color_display_name = color_names.get(args.color, args.color)
-                if is_first_seed:
-                    if not args.sprite:
-                        print(f"🎨 Using custom E-Tank color")
-                    print(f"   ❤️ E-Tank Color: {color_display_name}")
-        else:
-            if is_first_seed:
-                print(f"🎨 Using default customization")
-        if is_first_seed:
-            print("🌐 Connecting to maprando.com...", end="", flush=True)
-        driver.get("https://maprando.com/generate")
-        driver.execute_script(
-            f"localStorage.setItem('customization-form', JSON.stringify({json.dumps(customization_data)}));"
-        )
-        driver.refresh()
-        WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.ID, "fullSettingsPreset")))
-        if is_first_seed:
-            print(" ✓")
-        if current_preset:
-            if current_preset.endswith('.json') and os.path.isfile(current_preset):
-                preset_name = os.path.splitext(os.path.basename(current_preset))[0]
-                if current_preset not in loaded_preset_files:
-                    if is_first_seed or args.generate > 1:
-                        print(f"📋 Loading preset file '{preset_name}'...", end="", flush=True)
-                    preset_name = load_preset_file(driver, current_preset)
-                    loaded_preset_files[current_preset] = preset_name
-                    if is_first_seed or args.generate > 1:
-                        print(" ✓")
-                else:
-                    preset_name = loaded_preset_files[current_preset]
-                    if args.generate > 1:
-                        print(f"📋 Using preset '{preset_name}'...", end="", flush=True)
-                        print(" ✓")
-                select_preset(driver, preset_name)
+def parse_preset_names(page):
+    match = PRESET_SELECT.search(page)
+    if not match:
+        return None
+    return [html.unescape(re.sub(r'<[^>]+>', '', name)).strip() for name in PRESET_OPTION.findall(match.group(1))]
+
+def fetch_preset_names(base_url, offline=False):
+    request = urllib.request.Request(f"{base_url}/generate", headers={'User-Agent': get_random_user_agent(offline)})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return parse_preset_names(response.read().decode(errors='replace'))
+
+def get_preset_names(base_url=DEFAULT_BASE_URL, offline=False, refresh=False):
+    base_url = base_url.rstrip('/')
+    catalog = read_cache_file('presets.json') or {}
+    cached = catalog.get(base_url)
+    if offline or (cached and not refresh and time.time() - cached.get('fetched', 0) < PRESET_CATALOG_TTL):
+        return cached['names'] if cached else None
+    try:
+        names = fetch_preset_names(base_url, offline)
+    except (OSError, ValueError, http.client.HTTPException):
+        names = None
+    if not names:
+        return cached['names'] if cached else None
+    catalog[base_url] = {'fetched': time.time(), 'names': names}
+    write_cache_file('presets.json', catalog)
+    return names
+
+def describe_seed_nums(presets, seed_nums):
+    if len(presets) < 2:
+        return ""
+    return f" (seed {', '.join(str(seed_num) for seed_num in seed_nums[:5])}{', ...' if len(seed_nums) > 5 else ''})"
+
+def find_preset_problems(presets, base_url=DEFAULT_BASE_URL, offline=False):
+    problems = []
+    named = {}
+    checked = set()
+    for seed_num, preset in enumerate(presets, 1):
+        if not preset:
+            continue
+        if not preset.endswith('.json'):
+            named.setdefault(preset, []).append(seed_num)
+            continue
+        if preset in checked:
+            continue
+        checked.add(preset)
+        try:
+            with open(preset, "r") as f:
+                json.load(f)
+        except OSError:
+            problems.append(f"Preset file '{preset}' not found{describe_seed_nums(presets, [seed_num])}")
+        except ValueError:
+            problems.append(f"Preset file '{preset}' is not valid JSON{describe_seed_nums(presets, [seed_num])}")
+    if named:
+        names = get_preset_names(base_url, offline)
+        if names is not None and not all(preset in names for preset in named):
+            names = get_preset_names(base_url, offline, refresh=True)
+        if names is not None:
+            for preset, seed_nums in named.items():
+                if preset not in names:
+                    problems.append(f"Preset '{preset}' not found on {base_url}{describe_seed_nums(presets, seed_nums)}; available: {', '.join(names)}")
+    return problems
+
+class PresetNotFoundError(Exception):
+    pass
+
+class DownloadError(Exception):
+    pass
+
+class DirectoryWatcher:
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+
+    def __init__(self, path):
+        self.fd = None
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError, TypeError):
+            return
+        if fd < 0:
+            return
+        if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+            os.close(fd)
+            return
+        self.fd = fd
+
+    def wait(self, timeout):
+        if self.fd is None:
+            time.sleep(min(timeout, 0.1))
+            return
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            try:
+                os.read(self.fd, 65536)
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def download_complete(path):
+    if os.path.exists(path + ".crdownload") or os.path.exists(path + ".part"):
+        return False
+    try:
+        return os.path.getsize(path) > 0
+    except OSError:
+        return False
+
+def wait_for_download(session, filename, timeout=60):
+    path = os.path.join(session.download_dir, filename)
+    deadline = time.monotonic() + timeout
+    while not download_complete(path):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DownloadError(f"ROM download '{filename}' did not finish within {timeout:g} s")
+        session.watcher.wait(min(remaining, 1.0))
+    return path
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+def process_tree_rss(root_pid):
+    children = {}
+    rss = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/status') as f:
+                status = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        pid = int(entry)
+        children.setdefault(int(status['PPid'].strip()), []).append(pid)
+        rss[pid] = int(status.get('VmRSS', '0 kB').split()[0]) * 1024
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+class BrowserSession:
+    def __init__(self, browser_type, download_dir, rom_path=None, base_url=DEFAULT_BASE_URL, offline=False, lean=False, cache_dir=None):
+        self.base_url = base_url.rstrip('/')
+        self.download_dir = os.path.abspath(download_dir)
+        self.rom_path = os.path.abspath(rom_path) if rom_path else None
+        self.rom_staged = False
+        self.customization = None
+        self.watcher = DirectoryWatcher(self.download_dir)
+        self.driver = get_browser_driver(browser_type, self.download_dir, offline, lean, cache_dir)
+        self.generate_page_ready = False
+
+    def warm(self):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        self.driver.get(f"{self.base_url}/generate")
+        WebDriverWait(self.driver, 5).until(EC.presence_of_element_located((By.ID, "fullSettingsPreset")))
+        self.generate_page_ready = True
+
+    def healthy(self):
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def rss(self):
+        process = getattr(self.driver.service, 'process', None)
+        if process is None or not os.path.isdir('/proc'):
+            return None
+        return process_tree_rss(process.pid)
+
+    def quit(self):
+        self.driver.quit()
+        self.watcher.close()
+
+def stage_rom(session):
+    with open(session.rom_path, "rb") as f:
+        rom_data = base64.b64encode(f.read()).decode()
+    staged = session.driver.execute_async_script("""
+        const data = arguments[0];
+        const name = arguments[1];
+        const done = arguments[arguments.length - 1];
+        const binary = atob(data);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        const request = indexedDB.open('maprandogen', 1);
+        request.onupgradeneeded = () => request.result.createObjectStore('rom');
+        request.onerror = () => done(false);
+        request.onsuccess = () => {
+            const db = request.result;
+            const tx = db.transaction('rom', 'readwrite');
+            tx.objectStore('rom').put(new Blob([bytes]), name);
+            tx.oncomplete = () => { db.close(); done(true); };
+            tx.onerror = () => { db.close(); done(false); };
+        };
+    """, rom_data, os.path.basename(session.rom_path))
+    if not staged:
+        raise DownloadError("Could not stage the input ROM in the browser")
+    session.rom_staged = True
+
+def attach_staged_rom(session):
+    return session.driver.execute_async_script("""
+        const name = arguments[0];
+        const done = arguments[arguments.length - 1];
+        const request = indexedDB.open('maprandogen', 1);
+        request.onupgradeneeded = () => request.result.createObjectStore('rom');
+        request.onerror = () => done(false);
+        request.onsuccess = () => {
+            const db = request.result;
+            const get = db.transaction('rom').objectStore('rom').get(name);
+            get.onerror = () => { db.close(); done(false); };
+            get.onsuccess = () => {
+                db.close();
+                const input = document.getElementById('inputRom');
+                if (!get.result || !input) {
+                    done(false);
+                    return;
+                }
+                const transfer = new DataTransfer();
+                transfer.items.add(new File([get.result], name, {type: 'application/octet-stream'}));
+                input.files = transfer.files;
+                input.dispatchEvent(new Event('change', {bubbles: true}));
+                done(input.files.length === 1);
+            };
+        };
+    """, os.path.basename(session.rom_path))
+
+def apply_customization(session, customization_data):
+    if session.customization == customization_data:
+        return
+    session.driver.execute_script("""
+        const data = arguments[0];
+        localStorage.setItem('customization-form', JSON.stringify(data));
+        for (const [name, value] of Object.entries(data)) {
+            for (const field of document.getElementsByName(name)) {
+                if (field.type === 'checkbox') {
+                    field.checked = value === true || value === 'true';
+                } else if (field.type === 'radio') {
+                    field.checked = String(field.value) === String(value);
+                } else {
+                    field.value = value;
+                }
+            }
+        }
+    """, {'samus_sprite': '', 'etank_color': '', **customization_data})
+    session.customization = dict(customization_data)
+
+class BudgetExceededError(TimeoutError):
+    pass
+
+class SeedTrace:
+    def __init__(self, seed_num, worker_id, trace_log=None, on_checkpoint=None, budget=None):
+        self.seed_num = seed_num
+        self.worker_id = worker_id
+        self.trace_log = trace_log
+        self.on_checkpoint = on_checkpoint
+        self.seed_id = None
+        self.start = time.monotonic()
+        self.phases = []
+        self.budget = budget
+        self.deadline = self.start + budget if budget else None
+
+    def timeout(self, default):
+        if self.deadline is None:
+            return default
+        return max(0.01, min(default, self.deadline - time.monotonic()))
+
+    def over_budget(self, name):
+        return BudgetExceededError(f"Seed went over its {self.budget:g} s budget in the '{name}' phase")
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        if self.deadline is not None and start >= self.deadline:
+            raise self.over_budget(self.phases[-1][0] if self.phases else name)
+        try:
+            yield
+        except Exception as e:
+            if self.deadline is not None and time.monotonic() >= self.deadline and not isinstance(e, BudgetExceededError):
+                raise self.over_budget(name) from e
+            raise
+        finally:
+            self.phases.append((name, start, time.monotonic()))
+
+    def checkpoint(self, state, **fields):
+        if self.on_checkpoint:
+            self.on_checkpoint(state, fields)
+
+    def finish(self, outcome, error=None):
+        end = time.monotonic()
+        record = {
+            'seed': self.seed_num,
+            'seed_id': self.seed_id,
+            'worker': self.worker_id,
+            'outcome': outcome,
+            'error': error,
+            'start': self.start,
+            'end': end,
+            'phases': [{'name': name, 'start': start, 'end': stop, 'duration': stop - start} for name, start, stop in self.phases]
+        }
+        if self.trace_log:
+            self.trace_log.write(record)
+
+class TraceLog:
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'w')
+        self.durations = {}
+
+    def write(self, record):
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            for phase in record['phases']:
+                self.durations.setdefault(phase['name'], []).append(phase['duration'])
+            self.durations.setdefault('total', []).append(record['end'] - record['start'])
+
+    def close(self):
+        self.file.close()
+
+    def print_summary(self):
+        print(f"⏱️  Phase timings (s):")
+        print(f"   {'phase':<14}{'count':>7}{'p50':>9}{'p95':>9}{'max':>9}")
+        print("   " + "─" * 48)
+        for name, values in self.durations.items():
+            values = sorted(values)
+            print(f"   {name:<14}{len(values):>7}{percentile(values, 50):>9.2f}{percentile(values, 95):>9.2f}{values[-1]:>9.2f}")
+        print()
+
+def quiet(*args, **kwargs):
+    pass
+
+def build_customization(sprite=None, color=None):
+    customization_data = other_values.copy()
+    if sprite:
+        customization_data['samus_sprite'] = sprite
+    if color:
+        customization_data['etank_color'] = color
+    return customization_data
+
+def generate_seed(session, current_preset, customization_data, output_dir, out=quiet, trace=None, is_first_seed=True):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    driver = session.driver
+    if is_first_seed:
+        out("🌐 Connecting to maprando.com...", end="", flush=True)
+    with trace.phase('connect'):
+        if not session.generate_page_ready:
+            driver.get(f"{session.base_url}/generate")
+        session.generate_page_ready = False
+        apply_customization(session, customization_data)
+        WebDriverWait(driver, trace.timeout(5)).until(EC.presence_of_element_located((By.ID, "fullSettingsPreset")))
+        track_requests(driver)
+    if is_first_seed:
+        out(" ✓")
+    if current_preset:
+        if current_preset.endswith('.json') and os.path.isfile(current_preset):
+            preset_name = os.path.splitext(os.path.basename(current_preset))[0]
+            preset_hash = hash_file(current_preset)
+            imported_name = find_imported_preset(driver, preset_hash)
+            if imported_name is None:
+                out(f"📋 Loading preset file '{preset_name}'...", end="", flush=True)
+                with trace.phase('preset_import'):
+                    preset_name = load_preset_file(driver, current_preset, trace.timeout(5))
+                    remember_imported_preset(driver, preset_hash, preset_name)
+                out(" ✓")
             else:
-                preset_name = current_preset
-                if is_first_seed or args.generate > 1:
-                    print(f"📋 Selecting preset '{preset_name}'...", end="", flush=True)
-                try:
-                    select_preset(driver, preset_name)
-                    if is_first_seed or args.generate > 1:
-                        print(" ✓")
-                except Exception as e:
-                    print(f" ❌")
-                    print(f"   ERROR: Preset '{preset_name}' not found")
-                    print(f"   Available presets can be viewed at https://maprando.com/generate")
-                    driver.quit()
-                    exit(1)
-        elif is_first_seed and not current_preset:
-            print("📋 Using default settings")
-        time.sleep(0.3)
-        is_race_mode = check_race_mode_from_page(driver)
-        if args.generate > 1:
-            print("⚙️  Generating...", end="", flush=True)
+                preset_name = imported_name
+                out(f"📋 Using preset '{preset_name}'...", end="", flush=True)
+                out(" ✓")
+            with trace.phase('preset_select'):
+                select_preset(driver, preset_name, trace.timeout(5))
         else:
-            print("⚙️  Generating seed...", end="", flush=True)
-        generate_button = WebDriverWait(driver, 5).until(
+            preset_name = current_preset
+            out(f"📋 Selecting preset '{preset_name}'...", end="", flush=True)
+            try:
+                with trace.phase('preset_select'):
+                    select_preset(driver, preset_name, trace.timeout(5))
+                out(" ✓")
+            except Exception as e:
+                out(f" ❌")
+                out(f"   ERROR: Preset '{preset_name}' not found")
+                out(f"   Available presets can be viewed at {session.base_url}/generate")
+                raise PresetNotFoundError(preset_name) from e
+    elif is_first_seed:
+        out("📋 Using default settings")
+    with trace.phase('race_check'):
+        wait_for_idle(driver, trace.timeout(5))
+        is_race_mode = check_race_mode_from_page(driver)
+    out("⚙️  Generating seed...", end="", flush=True)
+    with trace.phase('generate'):
+        generate_button = WebDriverWait(driver, trace.timeout(5)).until(
             EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Generate Game')]"))
         )
         generate_button.click()
-        WebDriverWait(driver, 90).until(lambda d: '/seed/' in d.current_url)
-        time.sleep(1)
+        WebDriverWait(driver, trace.timeout(90)).until(lambda d: '/seed/' in d.current_url)
+    with trace.phase('seed_page'):
+        WebDriverWait(driver, trace.timeout(10)).until(
+            lambda d: d.find_elements(By.ID, "inputRom") and d.execute_script("return document.readyState") == "complete"
+        )
         seed_id = driver.current_url.split('/seed/')[-1].split('/')[0].split('?')[0]
-        seed_url = f"https://maprando.com/seed/{seed_id}"
-        print(f" {seed_id}", end="", flush=True)
+        trace.seed_id = seed_id
+        seed_url = f"{session.base_url}/seed/{seed_id}"
+        out(f" {seed_id}", end="", flush=True)
         spoiler_token = get_spoiler_token(driver)
-        if spoiler_token and is_race_mode:
-            print(" ✓")
-            print(f"   🏁 Race Mode Detected")
-            print(f"   🔒 Spoiler Token: {spoiler_token}")
-            saved_path = save_spoiler_token(output_dir, seed_id, spoiler_token)
+        race_token = spoiler_token if spoiler_token and is_race_mode else None
+        trace.checkpoint('generated', seed_id=seed_id, seed_url=seed_url, race_mode=bool(is_race_mode), spoiler_token=race_token)
+        if race_token:
+            out(" ✓")
+            out(f"   🏁 Race Mode Detected")
+            out(f"   🔒 Spoiler Token: {spoiler_token}")
+            saved_path = save_spoiler_token(output_dir, seed_id, spoiler_token, session.base_url)
             if saved_path:
-                print(f"   💾 Token saved to: {os.path.basename(saved_path)}")
+                out(f"   💾 Token saved to: {os.path.basename(saved_path)}")
+                trace.checkpoint('token_saved', token_path=saved_path)
             clear_spoiler_token(driver)
         else:
-            print(" ✓")
+            out(" ✓")
             if spoiler_token:
                 clear_spoiler_token(driver)
+    new_path, sha256 = fetch_seed_rom(session, seed_id, output_dir, trace)
+    out(f"   🔗 Seed URL: {seed_url}")
+    return SeedResult(
+        seed_id=seed_id,
+        seed_url=seed_url,
+        rom_path=new_path,
+        preset=current_preset,
+        sprite=customization_data.get('samus_sprite'),
+        color=customization_data.get('etank_color'),
+        race_mode=bool(is_race_mode),
+        spoiler_token=race_token,
+        sha256=sha256
+    )
+
+def fetch_seed_rom(session, seed_id, output_dir, trace):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    driver = session.driver
+    with trace.phase('rom_upload'):
         driver.execute_script("""
             const modals = document.querySelectorAll('.modal');
             for (let modal of modals) {
@@ -562,10 +1194,16 @@ try:
                 }
             }
         """)
-        time.sleep(0.5)
-        rom_input = driver.find_element(By.ID, "inputRom")
-        rom_input.send_keys(os.path.abspath(args.input))
-        time.sleep(1)
+        WebDriverWait(driver, trace.timeout(5)).until(EC.visibility_of_element_located(
+            (By.CSS_SELECTOR, '.modal.show input[type="submit"][value="Download ROM"]')
+        ))
+        if not session.rom_staged:
+            stage_rom(session)
+        if not attach_staged_rom(session):
+            stage_rom(session)
+            if not attach_staged_rom(session):
+                raise DownloadError("Could not attach the staged ROM to the 'Input ROM' form")
+    with trace.phase('download'):
         download_submit = driver.execute_script("""
             const modal = document.querySelector('.modal.show');
             if (modal) {
@@ -575,43 +1213,2071 @@ try:
         """)
         if download_submit:
             download_submit.click()
-        max_wait = 60
-        elapsed = 0
-        file_found = False
-        expected_filename = f"map-rando-{seed_id}.sfc"
-        while elapsed < max_wait:
-            for filename in os.listdir(output_dir):
-                if filename == expected_filename:
-                    file_path = os.path.join(output_dir, filename)
-                    try:
-                        file_size = os.path.getsize(file_path)
-                        time.sleep(2)
-                        new_size = os.path.getsize(file_path)
-                        if new_size == file_size:
-                            file_found = True
-                            break
-                    except:
-                        pass
-            if file_found:
+        downloaded_path = wait_for_download(session, f"map-rando-{seed_id}.sfc", trace.timeout(60))
+        trace.checkpoint('downloaded')
+        sha256 = hash_file(downloaded_path)
+        new_path = os.path.join(output_dir, f"Super Metroid Randomap {seed_id}.sfc")
+        os.replace(downloaded_path, new_path)
+        trace.checkpoint('renamed', rom_path=new_path)
+    return new_path, sha256
+
+def download_seed(session, seed_id, customization_data, output_dir, trace):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    with trace.phase('seed_page'):
+        session.driver.get(f"{session.base_url}/seed/{seed_id}/")
+        apply_customization(session, customization_data)
+        WebDriverWait(session.driver, trace.timeout(10)).until(EC.presence_of_element_located((By.ID, "inputRom")))
+    return fetch_seed_rom(session, seed_id, output_dir, trace)
+
+
+class HttpStatusError(Exception):
+    def __init__(self, method, path, status):
+        super().__init__(f"{method} {path} returned HTTP {status}")
+        self.status = status
+
+class HttpSession:
+    def __init__(self, base_url, download_dir, rom_path=None, offline=False):
+        self.base_url = base_url.rstrip('/')
+        parts = urllib.parse.urlsplit(self.base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.download_dir = os.path.abspath(download_dir)
+        self.rom_path = os.path.abspath(rom_path) if rom_path else None
+        self.rom_data = None
+        self.user_agent = get_random_user_agent(offline)
+        self.connection = None
+
+    def _connect(self, timeout):
+        if self.scheme == 'https':
+            self.connection = http.client.HTTPSConnection(self.host, self.port, timeout=timeout)
+        else:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        return self.connection
+
+    def request(self, method, path, body=None, headers=None, timeout=90):
+        request_headers = {"User-Agent": self.user_agent, "Connection": "keep-alive"}
+        request_headers.update(headers or {})
+        full_path = self.base_path + path
+        for attempt in range(2):
+            reused = self.connection is not None
+            connection = self.connection or self._connect(timeout)
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            try:
+                connection.request(method, full_path, body=body, headers=request_headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.quit()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self.quit()
+                raise
+            if response.status >= 400:
+                self.read(response)
+                raise HttpStatusError(method, path, response.status)
+            return response
+
+    def read(self, response, amt=None):
+        try:
+            return response.read(amt)
+        except BaseException:
+            self.quit()
+            raise
+
+    def post_multipart(self, path, fields, files=(), timeout=90):
+        boundary = f"----maprandogen{secrets.token_hex(16)}"
+        parts = []
+        for name, value in fields:
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        for name, filename, data in files:
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+            )
+            parts.append(data)
+            parts.append(b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode())
+        body = b"".join(parts)
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        return self.request("POST", path, body=body, headers=headers, timeout=timeout)
+
+    def read_rom(self):
+        if self.rom_data is None:
+            with open(self.rom_path, "rb") as f:
+                self.rom_data = f.read()
+        return self.rom_data
+
+    def warm(self):
+        pass
+
+    def healthy(self):
+        return True
+
+    def rss(self):
+        return None
+
+    def quit(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+def customization_form_fields(customization_data):
+    fields = []
+    for name, value in customization_data.items():
+        if value is True:
+            fields.append((name, "on"))
+        elif value is not False:
+            fields.append((name, value))
+    return fields
+
+def generate_seed_http(session, current_preset, customization_data, output_dir, out=quiet, trace=None, is_first_seed=True):
+    if not (current_preset and current_preset.endswith('.json') and os.path.isfile(current_preset)):
+        raise ValueError("The http engine needs a JSON preset file (named presets are only available in the browser)")
+    preset_name = os.path.splitext(os.path.basename(current_preset))[0]
+    out(f"📋 Using preset file '{preset_name}'...", end="", flush=True)
+    with trace.phase('preset_import'):
+        with open(current_preset, "r") as f:
+            settings = f.read()
+        is_race_mode = bool(json.loads(settings).get("other_settings", {}).get("race_mode", False))
+    out(" ✓")
+    out("⚙️  Generating seed...", end="", flush=True)
+    spoiler_token = secrets.token_hex(16)
+    with trace.phase('generate'):
+        response = session.post_multipart("/randomize", [("spoiler_token", spoiler_token), ("settings", settings)], timeout=trace.timeout(90))
+        seed_path = json.loads(session.read(response).decode())["seed_url"]
+    seed_id = seed_path.split('/seed/')[-1].split('/')[0].split('?')[0]
+    trace.seed_id = seed_id
+    seed_url = f"{session.base_url}/seed/{seed_id}"
+    trace.checkpoint('generated', seed_id=seed_id, seed_url=seed_url, race_mode=is_race_mode, spoiler_token=spoiler_token if is_race_mode else None)
+    out(f" {seed_id}", end="", flush=True)
+    out(" ✓")
+    if is_race_mode:
+        out(f"   🏁 Race Mode Detected")
+        out(f"   🔒 Spoiler Token: {spoiler_token}")
+        saved_path = save_spoiler_token(output_dir, seed_id, spoiler_token, session.base_url)
+        if saved_path:
+            out(f"   💾 Token saved to: {os.path.basename(saved_path)}")
+            trace.checkpoint('token_saved', token_path=saved_path)
+    new_path, sha256 = download_seed_http(session, seed_id, customization_data, output_dir, trace)
+    out(f"   🔗 Seed URL: {seed_url}")
+    return SeedResult(
+        seed_id=seed_id,
+        seed_url=seed_url,
+        rom_path=new_path,
+        preset=current_preset,
+        sprite=customization_data.get('samus_sprite'),
+        color=customization_data.get('etank_color'),
+        race_mode=is_race_mode,
+        spoiler_token=spoiler_token if is_race_mode else None,
+        sha256=sha256
+    )
+
+def download_seed_http(session, seed_id, customization_data, output_dir, trace):
+    with trace.phase('download'):
+        response = session.post_multipart(
+            f"/seed/{seed_id}/customize",
+            customization_form_fields(customization_data),
+            [("rom", os.path.basename(session.rom_path), session.read_rom())],
+            timeout=trace.timeout(60)
+        )
+        part_path = os.path.join(session.download_dir, f"map-rando-{seed_id}.sfc.part")
+        new_path = os.path.join(output_dir, f"Super Metroid Randomap {seed_id}.sfc")
+        sha256_hash = hashlib.sha256()
+        size = 0
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in iter(lambda: response.read(1024 * 1024), b""):
+                    f.write(chunk)
+                    sha256_hash.update(chunk)
+                    size += len(chunk)
+        except BaseException:
+            session.quit()
+            raise
+        expected_size = response.getheader("Content-Length")
+        if expected_size is not None and int(expected_size) != size:
+            session.quit()
+            os.remove(part_path)
+            raise DownloadError(f"ROM download for {seed_id} was truncated ({size} of {expected_size} bytes)")
+        trace.checkpoint('downloaded')
+        os.replace(part_path, new_path)
+        trace.checkpoint('renamed', rom_path=new_path)
+    return new_path, sha256_hash.hexdigest()
+
+class SpoilerUnlockError(Exception):
+    pass
+
+class RomHashMismatchError(Exception):
+    def __init__(self, actual_hash):
+        super().__init__(f"ROM hash mismatch: expected {EXPECTED_ROM_HASH}, got {actual_hash}")
+        self.actual_hash = actual_hash
+
+@dataclasses.dataclass
+class SeedResult:
+    seed_id: str
+    seed_url: str
+    rom_path: str
+    preset: str = None
+    sprite: str = None
+    color: str = None
+    race_mode: bool = False
+    spoiler_token: str = None
+    sha256: str = None
+    variants: list = None
+
+def unlock_spoiler_in_browser(session, seed_id, token, out=quiet, timeout=10):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import WebDriverException
+    driver = session.driver
+    set_token = "localStorage.setItem('spoilerToken', arguments[0]);"
+    on_site = driver.current_url.startswith(session.base_url)
+    out("🌐 Connecting to seed page...", end="", flush=True)
+    if on_site:
+        driver.execute_script(set_token, token)
+    driver.get(f"{session.base_url}/seed/{seed_id}/")
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    out(" ✓")
+    out("🔑 Setting spoiler token...", end="", flush=True)
+    if not on_site:
+        driver.execute_script(set_token, token)
+        out(" ✓")
+        out("🔄 Reloading page...", end="", flush=True)
+        driver.refresh()
+        WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
+    out(" ✓")
+    out("🔓 Unlocking spoiler data...", end="", flush=True)
+    try:
+        try:
+            result = driver.execute_async_script("""
+                const timeout = arguments[0];
+                const done = arguments[arguments.length - 1];
+                const findLink = () => document.querySelector('a[href*="visualizer"]');
+                const token = localStorage.getItem('spoilerToken');
+                if (!token) {
+                    done({success: false, error: 'No spoiler token found in localStorage'});
+                    return;
+                }
+                const unlockForm = document.getElementById('unlockForm');
+                if (!unlockForm) {
+                    done({success: false, error: 'Unlock button not found - seed may not be in race mode'});
+                    return;
+                }
+                let timer = null;
+                const observer = new MutationObserver(() => {
+                    const link = findLink();
+                    if (link) {
+                        finish(link);
+                    }
+                });
+                const finish = (link) => {
+                    observer.disconnect();
+                    clearTimeout(timer);
+                    if (link) {
+                        done({success: true, visualizerUrl: link.href, linkText: link.textContent.trim()});
+                    } else {
+                        done({success: false, error: 'Visualizer link not found after unlock'});
+                    }
+                };
+                observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, attributeFilter: ['href']});
+                timer = setTimeout(() => finish(findLink()), timeout);
+                unlockForm.style.display = 'flex';
+                const submitButton = unlockForm.querySelector('input[type="submit"]');
+                if (submitButton) {
+                    submitButton.click();
+                } else {
+                    unlockForm.submit();
+                }
+            """, timeout * 1000)
+        except WebDriverException:
+            try:
+                link = WebDriverWait(driver, timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href*="visualizer"]'))
+                )
+                result = {'success': True, 'visualizerUrl': link.get_attribute('href')}
+            except WebDriverException:
+                result = {'success': False, 'error': 'Visualizer link not found after unlock'}
+    finally:
+        clear_spoiler_token(driver)
+    out(" ✓")
+    if not result.get('success'):
+        raise SpoilerUnlockError(result.get('error', 'Unknown error'))
+    return result.get('visualizerUrl')
+
+def unlock_spoiler_http(session, seed_id, token, out=quiet):
+    out("🔓 Unlocking spoiler data...", end="", flush=True)
+    try:
+        response = session.post_multipart(f"/seed/{seed_id}/unlock", [("spoiler_token", token)], timeout=30)
+    except HttpStatusError as e:
+        if e.status in (401, 403):
+            raise SpoilerUnlockError("Invalid spoiler token") from e
+        raise
+    body = session.read(response)
+    if 300 <= response.status < 400 and response.getheader("Location"):
+        location = urllib.parse.urlsplit(urllib.parse.urljoin(session.base_url + "/", response.getheader("Location")))
+        response = session.request("GET", location.path[len(session.base_path):] + (f"?{location.query}" if location.query else ""))
+        body = session.read(response)
+    match = re.search(r'href="([^"]*visualizer[^"]*)"', body.decode(errors="replace"))
+    if not match:
+        raise SpoilerUnlockError("Visualizer link not found after unlock")
+    out(" ✓")
+    return urllib.parse.urljoin(f"{session.base_url}/seed/{seed_id}/", html.unescape(match.group(1)))
+
+class Generator:
+    MAX_CONSECUTIVE_FAILURES = 3
+
+    def __init__(self, input_rom=None, browser='chrome', output_dir=None, engine='selenium', base_url=DEFAULT_BASE_URL,
+                 download_dir=None, offline=False, verify_rom=True, trace_log=None, worker_id=1, seed_index=None, store='rom',
+                 variants=0, lean=False, recycle_after=None, max_rss=None, budget=None):
+        if engine not in ('selenium', 'http'):
+            raise ValueError(f"Unknown engine '{engine}'")
+        if store not in ('rom', 'delta'):
+            raise ValueError(f"Unknown storage mode '{store}'")
+        self.input_rom = os.path.abspath(input_rom) if input_rom else None
+        self.browser = browser
+        self.engine = engine
+        self.base_url = base_url.rstrip('/')
+        self.output_dir = os.path.abspath(output_dir) if output_dir else os.getcwd()
+        self.download_dir = os.path.abspath(download_dir) if download_dir else self.output_dir
+        self.offline = offline
+        self.verify_rom = verify_rom
+        self.trace_log = trace_log
+        self.worker_id = worker_id
+        self.seed_index = seed_index
+        self.store = store
+        self.variants = variants
+        self.lean = lean
+        self.recycle_after = recycle_after
+        self.max_rss = max_rss
+        self.budget = budget
+        self.cosmetics = None
+        self.checksums = None
+        self.base_rom = None
+        self.base_index = None
+        self.session = None
+        self.seeds_generated = 0
+        self.session_seeds = 0
+        self.consecutive_failures = 0
+        self.crashed = False
+        self.recycles = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        if self.session is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            os.makedirs(self.download_dir, exist_ok=True)
+            if self.engine == 'http':
+                self.session = HttpSession(self.base_url, self.download_dir, self.input_rom, self.offline)
+            else:
+                cache_dir = get_browser_cache_dir(self.browser, self.worker_id) if self.lean else None
+                self.session = BrowserSession(self.browser, self.download_dir, self.input_rom, self.base_url, self.offline, self.lean, cache_dir)
+            self.session_seeds = 0
+        return self.session
+
+    def _prepare(self, sprite, color):
+        if not self.input_rom:
+            raise ValueError("An input ROM is required to generate seeds")
+        if sprite and sprite not in samus_sprites:
+            raise ValueError(f"Invalid sprite '{sprite}'")
+        if color and color not in etank_colors:
+            raise ValueError(f"Invalid color '{color}'")
+        if self.verify_rom:
+            input_rom_hash = verify_rom_hash(self.input_rom)
+            if input_rom_hash != EXPECTED_ROM_HASH:
+                raise RomHashMismatchError(input_rom_hash)
+            self.verify_rom = False
+        return self.start()
+
+    def _run(self, trace, work):
+        try:
+            result = work()
+        except Exception as e:
+            trace.finish('failed', describe_error(e))
+            self.consecutive_failures += 1
+            self.crashed = self.session is not None and not self.session.healthy()
+            if self.crashed or self.consecutive_failures >= self.MAX_CONSECUTIVE_FAILURES:
+                self.recycle()
+            raise
+        trace.finish('ok')
+        self.seeds_generated += 1
+        self.session_seeds += 1
+        self.consecutive_failures = 0
+        self.crashed = False
+        if self.needs_recycle():
+            self.recycle()
+        return result
+
+    def generate(self, preset=None, sprite=None, color=None, out=quiet, seed_num=None, on_checkpoint=None):
+        session = self._prepare(sprite, color)
+        customization_data = build_customization(sprite, color)
+        trace = SeedTrace(seed_num or self.seeds_generated + 1, self.worker_id, self.trace_log, on_checkpoint, self.budget)
+        generate = generate_seed_http if self.engine == 'http' else generate_seed
+        result = self._run(trace, lambda: self._finish(
+            generate(session, preset, customization_data, self.output_dir, out, trace, self.seeds_generated == 0), trace, session
+        ))
+        if self.seed_index is not None:
+            self.seed_index.add(result)
+        return result
+
+    def _finish(self, result, trace, session=None):
+        trace.deadline = None
+        if result.sha256 is None:
+            result = dataclasses.replace(result, sha256=hash_file(result.rom_path))
+        if self.variants and session is not None:
+            with trace.phase('variants'):
+                result = dataclasses.replace(result, variants=self._write_variants(session, result))
+        files = [(result.rom_path, result.sha256, result.sprite, result.color)]
+        files += [(variant['rom_path'], variant['sha256'], variant['sprite'], variant['color']) for variant in result.variants or []]
+        if self.store == 'delta':
+            with trace.phase('store'):
+                files = [(*self._store_delta(rom_path, result.seed_id, sha256), sprite, color) for rom_path, sha256, sprite, color in files]
+                for variant, (rom_path, _, _, _) in zip(result.variants or [], files[1:]):
+                    variant['rom_path'] = rom_path
+            trace.checkpoint('stored', rom_path=files[0][0])
+            result = dataclasses.replace(result, rom_path=files[0][0])
+        if self.checksums is None:
+            self.checksums = ChecksumLog(self.output_dir)
+        for file_path, file_sha256, sprite, color in files:
+            self.checksums.add(file_path, file_sha256, result.seed_id, result.preset, sprite, color)
+        return result
+
+    def _store_delta(self, rom_path, seed_id, sha256):
+        if self.base_rom is None:
+            with open(self.input_rom, 'rb') as f:
+                self.base_rom = f.read()
+            self.base_index = bps_source_index(self.base_rom)
+        return store_delta(rom_path, self.base_rom, {'seed_id': seed_id, 'sha256': sha256, 'base_sha256': EXPECTED_ROM_HASH}, self.base_index)
+
+    def _write_variants(self, session, result):
+        if self.cosmetics is None:
+            self.cosmetics = CosmeticPatches()
+        download = download_seed_http if self.engine == 'http' else download_seed
+        fetched = {}
+
+        def fetch(sprite=None, color=None):
+            if (sprite, color) not in fetched:
+                with tempfile.TemporaryDirectory(dir=self.download_dir) as temp_dir:
+                    rom_path, _ = download(session, result.seed_id, build_customization(sprite, color), temp_dir, SeedTrace(None, self.worker_id))
+                    with open(rom_path, 'rb') as f:
+                        fetched[(sprite, color)] = f.read()
+            return fetched[(sprite, color)]
+
+        learn_left = COSMETIC_LEARN_LIMIT
+
+        def patch(kind, value):
+            nonlocal learn_left
+            ranges = self.cosmetics.get(kind, value)
+            if ranges is None and learn_left > 0:
+                learn_left -= 1
+                ranges = self.cosmetics.learn(kind, value, fetch(), fetch(**{kind: value}))
+            return ranges
+
+        def patched(sprite, color):
+            add_sprite = patch('sprite', sprite)
+            add_color = patch('color', color) if add_sprite is not None else None
+            if add_color is None:
+                return None
+            remove_sprite, remove_color = self.cosmetics.get('sprite', result.sprite), self.cosmetics.get('color', result.color)
+            if remove_sprite is not None and remove_color is not None:
+                rom = bytearray(seed_rom)
+                if swap_cosmetic(rom, remove_sprite, add_sprite) and swap_cosmetic(rom, remove_color, add_color):
+                    return rom
+            rom = bytearray(fetch())
+            if swap_cosmetic(rom, [], add_sprite) and swap_cosmetic(rom, [], add_color):
+                return rom
+            return None
+
+        with open(result.rom_path, 'rb') as f:
+            seed_rom = f.read()
+        variants = []
+        for sprite, color in pick_variants(self.variants, [(result.sprite, result.color)], self.cosmetics):
+            rom = patched(sprite, color)
+            if rom is None:
+                rom = fetch(sprite, color)
+            rom_path = os.path.join(self.output_dir, f"Super Metroid Randomap {result.seed_id} {sprite} {color}.sfc")
+            with open(rom_path + ".part", 'wb') as f:
+                f.write(rom)
+            os.replace(rom_path + ".part", rom_path)
+            variants.append({'sprite': sprite, 'color': color, 'rom_path': rom_path, 'sha256': hashlib.sha256(rom).hexdigest()})
+        return variants
+
+    def download(self, seed_id, sprite=None, color=None, preset=None, race_mode=False, spoiler_token=None, seed_num=None, on_checkpoint=None):
+        session = self._prepare(sprite, color)
+        customization_data = build_customization(sprite, color)
+        trace = SeedTrace(seed_num or self.seeds_generated + 1, self.worker_id, self.trace_log, on_checkpoint, self.budget)
+        trace.seed_id = seed_id
+        download = download_seed_http if self.engine == 'http' else download_seed
+
+        def work():
+            rom_path, sha256 = download(session, seed_id, customization_data, self.output_dir, trace)
+            return self._finish(SeedResult(
+                seed_id=seed_id,
+                seed_url=f"{self.base_url}/seed/{seed_id}",
+                rom_path=rom_path,
+                preset=preset,
+                sprite=sprite,
+                color=color,
+                race_mode=race_mode,
+                spoiler_token=spoiler_token if race_mode else None,
+                sha256=sha256
+            ), trace, session)
+
+        result = self._run(trace, work)
+        if race_mode and spoiler_token and not os.path.isfile(os.path.join(self.output_dir, f"SpoilerToken_{seed_id}.txt")):
+            save_spoiler_token(self.output_dir, seed_id, spoiler_token, self.base_url)
+        if self.seed_index is not None:
+            self.seed_index.add(result)
+        return result
+
+    def unlock_spoiler(self, seed_id, token, out=quiet):
+        unlock = unlock_spoiler_http if self.engine == 'http' else unlock_spoiler_in_browser
+        return unlock(self.start(), seed_id, token, out)
+
+    def warm(self):
+        self.start().warm()
+
+    def healthy(self):
+        return self.session is not None and self.session.healthy()
+
+    def rss(self):
+        return self.session.rss() if self.session is not None else None
+
+    def needs_recycle(self):
+        if self.session is None:
+            return False
+        if self.recycle_after and self.session_seeds >= self.recycle_after:
+            return True
+        if self.max_rss:
+            rss = self.session.rss()
+            return rss is not None and rss > self.max_rss
+        return False
+
+    def recycle(self):
+        self.consecutive_failures = 0
+        if self.session is not None:
+            self.close()
+            self.recycles += 1
+
+    def close(self):
+        if self.session is not None:
+            self.session.quit()
+            self.session = None
+        if self.checksums is not None:
+            self.checksums.close()
+            self.checksums = None
+
+def is_transient_error(error):
+    if isinstance(error, HttpStatusError):
+        return error.status == 429 or error.status >= 500
+    selenium_exceptions = sys.modules.get('selenium.common.exceptions')
+    if selenium_exceptions and isinstance(error, selenium_exceptions.WebDriverException):
+        return True
+    return isinstance(error, (DownloadError, http.client.HTTPException, ConnectionError, TimeoutError))
+
+class AdaptiveScheduler:
+    def __init__(self, max_concurrency=1, rpm=None, retries=2, backoff=2.0, max_backoff=60.0):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.rpm = rpm
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self.next_request = 0.0
+        self.last_decrease = 0.0
+        self.latency = None
+        self.latency_floor = None
+        self.successes = 0
+        self.failures = 0
+        self.retried = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+            start = time.monotonic()
+            if self.rpm:
+                start = max(start, self.next_request)
+                self.next_request = start + 60 / self.rpm
+        delay = start - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(self, latency=None, error=None):
+        with self.condition:
+            self.in_flight -= 1
+            if error is None:
+                self.successes += 1
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                self.latency_floor = self.latency if self.latency_floor is None else min(self.latency, self.latency_floor * 1.02)
+                if self.latency > 2 * self.latency_floor:
+                    self._decrease()
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            else:
+                self.failures += 1
+                if is_transient_error(error):
+                    self._decrease()
+            self.condition.notify_all()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self.last_decrease < (self.latency or 0):
+            return
+        self.last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def generate(self, generator, preset=None, sprite=None, color=None, out=quiet, seed_num=None, on_retry=None, on_checkpoint=None):
+        return self.run(
+            generator,
+            lambda: generator.generate(preset, sprite, color, out=out, seed_num=seed_num, on_checkpoint=on_checkpoint),
+            on_retry
+        )
+
+    def run(self, generator, task, on_retry=None):
+        attempt = 0
+        restarted = False
+        while True:
+            self.acquire()
+            started = time.monotonic()
+            try:
+                result = task()
+            except Exception as e:
+                self.release(error=e)
+                if generator.crashed and not restarted:
+                    restarted = True
+                    with self.condition:
+                        self.retried += 1
+                    if on_retry:
+                        on_retry(e, None, 0.0)
+                    continue
+                if attempt >= self.retries or not is_transient_error(e):
+                    raise
+                if not generator.healthy():
+                    generator.close()
+                delay = self.backoff_delay(attempt)
+                attempt += 1
+                with self.condition:
+                    self.retried += 1
+                if on_retry:
+                    on_retry(e, attempt, delay)
+                time.sleep(delay)
+                continue
+            self.release(time.monotonic() - started)
+            return result
+
+    def stats(self):
+        with self.condition:
+            attempts = self.successes + self.failures
+            return {
+                'concurrency': int(self.limit),
+                'retries': self.retried,
+                'error_rate': self.failures / attempts if attempts else 0.0,
+                'latency': self.latency
+            }
+
+class JobQueueFull(Exception):
+    pass
+
+class Job:
+    def __init__(self, job_id, preset=None, sprite=None, color=None, count=1, randomize=False, background=False):
+        self.id = job_id
+        self.preset = preset
+        self.sprite = sprite
+        self.color = color
+        self.count = count
+        self.randomize = randomize
+        self.background = background
+        self.status = 'queued'
+        self.results = []
+        self.errors = []
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def seed_started(self):
+        with self.lock:
+            if self.status == 'queued':
+                self.status = 'running'
+
+    def seed_finished(self, result=None, error=None):
+        with self.lock:
+            if result is not None:
+                self.results.append(result)
+            else:
+                self.errors.append(error)
+            if len(self.results) + len(self.errors) < self.count:
+                return False
+            self.status = 'failed' if self.errors else 'done'
+            self.finished = time.time()
+        self.done.set()
+        return True
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'preset': self.preset,
+                'sprite': self.sprite,
+                'color': self.color,
+                'random': self.randomize,
+                'count': self.count,
+                'completed': len(self.results),
+                'failed': len(self.errors),
+                'created': self.created,
+                'finished': self.finished,
+                'seeds': [dataclasses.asdict(result) for result in self.results],
+                'errors': list(self.errors)
+            }
+
+class GeneratorPool:
+    HEALTH_CHECK_INTERVAL = 30
+    JOB_RETENTION = 3600
+
+    def __init__(self, make_generator, size=1, queue_size=100, on_seed=None, scheduler=None):
+        self.make_generator = make_generator
+        self.size = size
+        self.scheduler = scheduler or AdaptiveScheduler(size, retries=0)
+        self.queue_size = queue_size
+        self.on_seed = on_seed
+        self.tasks = queue.PriorityQueue()
+        self.queued = 0
+        self.task_order = 0
+        self.jobs = {}
+        self.workers = {}
+        self.lock = threading.Lock()
+        self.next_job_id = 1
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for worker_id in range(1, self.size + 1):
+            self.workers[worker_id] = {'state': 'starting', 'seeds': 0, 'restarts': 0}
+            thread = threading.Thread(target=self._run_worker, args=(worker_id,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, preset=None, sprite=None, color=None, count=1, randomize=False, background=False):
+        with self.lock:
+            if not background:
+                if self.queued + count > self.queue_size:
+                    raise JobQueueFull(f"Queue holds at most {self.queue_size} seeds")
+                self.queued += count
+            expired = time.time() - self.JOB_RETENTION
+            for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished < expired]:
+                del self.jobs[job_id]
+            job = Job(str(self.next_job_id), preset, sprite, color, count, randomize, background)
+            self.next_job_id += 1
+            self.jobs[job.id] = job
+            for _ in range(count):
+                self._put(1 if background else 0, job)
+        return job
+
+    def _put(self, priority, job):
+        self.task_order += 1
+        self.tasks.put((priority, self.task_order, job))
+
+    def _take(self, timeout):
+        _, _, job = self.tasks.get(timeout=timeout)
+        if job is not None and not job.background:
+            with self.lock:
+                self.queued -= 1
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self):
+        with self.lock:
+            return {
+                'workers': [dict(worker, id=worker_id) for worker_id, worker in self.workers.items()],
+                'queued': self.queued,
+                'background': self.tasks.qsize() - self.queued,
+                'queue_size': self.queue_size,
+                'jobs': len(self.jobs)
+            }
+
+    def _set_state(self, worker_id, **changes):
+        with self.lock:
+            self.workers[worker_id].update(changes)
+
+    def _spawn(self, worker_id):
+        delay = 1
+        while not self.stopping.is_set():
+            generator = self.make_generator(worker_id)
+            try:
+                generator.warm()
+                self._set_state(worker_id, state='idle')
+                return generator
+            except Exception as e:
+                generator.close()
+                self._set_state(worker_id, state='unavailable', error=describe_error(e))
+                self.stopping.wait(delay)
+                delay = min(delay * 2, 60)
+        return None
+
+    def _replace(self, worker_id, generator):
+        generator.close()
+        with self.lock:
+            self.workers[worker_id]['restarts'] += 1
+            self.workers[worker_id]['state'] = 'restarting'
+        return self._spawn(worker_id)
+
+    def _run_worker(self, worker_id):
+        generator = self._spawn(worker_id)
+        try:
+            while generator is not None and not self.stopping.is_set():
+                try:
+                    job = self._take(self.HEALTH_CHECK_INTERVAL)
+                except queue.Empty:
+                    if not generator.healthy():
+                        generator = self._replace(worker_id, generator)
+                    continue
+                if job is None:
+                    break
+                if not generator.healthy():
+                    generator = self._replace(worker_id, generator)
+                    if generator is None:
+                        with self.lock:
+                            if not job.background:
+                                self.queued += 1
+                            self._put(1 if job.background else 0, job)
+                        break
+                self._set_state(worker_id, state='busy')
+                job.seed_started()
+                sprite, color = job.sprite, job.color
+                if job.randomize:
+                    sprite, color = random.choice(list(samus_sprites)), random.choice(list(etank_colors))
+                try:
+                    result = self.scheduler.generate(generator, job.preset, sprite, color)
+                except Exception as e:
+                    error = describe_error(e)
+                    job.seed_finished(error=error)
+                    if self.on_seed:
+                        self.on_seed(job, worker_id, None, error)
+                    if not generator.healthy():
+                        generator = self._replace(worker_id, generator)
+                        continue
+                else:
+                    job.seed_finished(result=result)
+                    with self.lock:
+                        self.workers[worker_id]['seeds'] += 1
+                    if self.on_seed:
+                        self.on_seed(job, worker_id, result, None)
+                try:
+                    generator.warm()
+                except Exception:
+                    generator = self._replace(worker_id, generator)
+                    continue
+                self._set_state(worker_id, state='idle')
+        finally:
+            if generator is not None:
+                generator.close()
+            self._set_state(worker_id, state='stopped')
+
+    def close(self):
+        self.stopping.set()
+        with self.lock:
+            for _ in self.threads:
+                self._put(-1, None)
+        for thread in self.threads:
+            thread.join()
+
+class Stockpile:
+    REFILL_INTERVAL = 60
+
+    def __init__(self, path, targets):
+        self.path = path
+        self.targets = targets
+        self.lock = threading.Lock()
+        self.pending = {preset: 0 for preset in targets}
+        self.inventory = {preset: [] for preset in targets}
+        self.pool = None
+        self.stopping = threading.Event()
+        self.thread = None
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            saved = {}
+        for preset, seeds in saved.items():
+            self.inventory[preset] = [seed for seed in seeds if os.path.isfile(seed['rom_path'])]
+
+    def save(self):
+        write_json_atomic(self.path, self.inventory, durable=True)
+
+    def take(self, preset):
+        with self.lock:
+            seeds = self.inventory.get(preset)
+            if not seeds:
+                return None
+            seed = seeds.pop(0)
+            self.save()
+        self.refill(preset)
+        return seed
+
+    def add(self, preset, result):
+        with self.lock:
+            self.pending[preset] -= 1
+            self.inventory[preset].append(dataclasses.asdict(result))
+            self.save()
+
+    def seed_failed(self, preset):
+        with self.lock:
+            self.pending[preset] -= 1
+
+    def refill(self, preset):
+        if self.pool is None or preset not in self.targets:
+            return
+        target, low_water = self.targets[preset]
+        with self.lock:
+            available = len(self.inventory[preset])
+            if available >= low_water and available > 0:
+                return
+            missing = target - available - self.pending[preset]
+            if missing <= 0:
+                return
+            self.pending[preset] += missing
+        self.pool.submit(preset, count=missing, background=True)
+
+    def start(self, pool):
+        self.pool = pool
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            for preset in self.targets:
+                self.refill(preset)
+            if self.stopping.wait(self.REFILL_INTERVAL):
                 break
-            time.sleep(1)
-            elapsed += 1
-        if file_found:
-            old_path = os.path.join(output_dir, expected_filename)
-            new_filename = f"Super Metroid Randomap {seed_id}.sfc"
-            new_path = os.path.join(output_dir, new_filename)
+
+    def status(self):
+        with self.lock:
+            return {
+                preset: {
+                    'available': len(self.inventory.get(preset, [])),
+                    'target': target,
+                    'low_water': low_water,
+                    'generating': self.pending[preset]
+                }
+                for preset, (target, low_water) in self.targets.items()
+            }
+
+    def close(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+class BatchManifest:
+    PLAN_FILE = '.maprandogen-batch.json'
+    JOURNAL_FILE = '.maprandogen-batch.jsonl'
+
+    def __init__(self, output_dir, slots, randomized=False, states=None):
+        self.output_dir = output_dir
+        self.slots = slots
+        self.randomized = randomized
+        self.states = states or {}
+        self.lock = threading.Lock()
+        self.journal = open(os.path.join(output_dir, self.JOURNAL_FILE), 'a')
+
+    @classmethod
+    def create(cls, output_dir, seed_plan, randomized=False):
+        slots = []
+        for slot, (preset, sprite, color) in enumerate(seed_plan, 1):
+            if preset and preset.endswith('.json') and os.path.isfile(preset):
+                preset = os.path.abspath(preset)
+            slots.append({'slot': slot, 'preset': preset, 'sprite': sprite, 'color': color})
+        open(os.path.join(output_dir, cls.JOURNAL_FILE), 'w').close()
+        write_json_atomic(os.path.join(output_dir, cls.PLAN_FILE), {'created': time.time(), 'random': randomized, 'slots': slots}, durable=True)
+        return cls(output_dir, slots, randomized)
+
+    @classmethod
+    def load(cls, output_dir):
+        with open(os.path.join(output_dir, cls.PLAN_FILE), 'r') as f:
+            plan = json.load(f)
+        states = {}
+        try:
+            with open(os.path.join(output_dir, cls.JOURNAL_FILE), 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    states.setdefault(record['slot'], {}).update(record)
+        except FileNotFoundError:
+            pass
+        return cls(output_dir, plan['slots'], plan.get('random', False), states)
+
+    def record(self, slot, state, **fields):
+        with self.lock:
+            entry = self.states.setdefault(slot, {})
+            entry.update(fields, slot=slot, state=state)
+            self.journal.write(json.dumps(dict(fields, slot=slot, state=state, time=time.time())) + "\n")
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+
+    def state(self, slot):
+        with self.lock:
+            return dict(self.states.get(slot, {}))
+
+    def is_done(self, slot):
+        state = self.state(slot)
+        rom_path = state.get('rom_path') or (
+            state.get('seed_id') and os.path.join(self.output_dir, f"Super Metroid Randomap {state['seed_id']}.sfc")
+        )
+        return bool(rom_path) and os.path.isfile(rom_path) and os.path.getsize(rom_path) > 0
+
+    def close(self):
+        self.journal.close()
+
+class ChecksumLog:
+    FILE = 'checksums.jsonl'
+
+    def __init__(self, directory):
+        self.fd = os.open(os.path.join(directory, self.FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    @classmethod
+    def load(cls, directory):
+        records = {}
+        with open(os.path.join(directory, cls.FILE), 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['file']] = record
+        return records
+
+    def add(self, file_path, sha256, seed_id=None, preset=None, sprite=None, color=None):
+        record = {
+            'file': os.path.basename(file_path), 'seed_id': seed_id, 'size': os.path.getsize(file_path), 'sha256': sha256,
+            'preset': preset, 'sprite': sprite, 'color': color, 'created': time.time()
+        }
+        os.write(self.fd, (json.dumps(record) + "\n").encode())
+
+    def close(self):
+        os.close(self.fd)
+
+class SeedIndex:
+    FILE = 'seeds.sqlite3'
+    FIELDS = ('seed_id', 'seed_url', 'preset', 'sprite', 'color', 'race_mode', 'spoiler_token', 'rom_path', 'sha256', 'created', 'updated')
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS seeds (
+                seed_id TEXT PRIMARY KEY,
+                seed_url TEXT,
+                preset TEXT,
+                sprite TEXT,
+                color TEXT,
+                race_mode INTEGER NOT NULL DEFAULT 0,
+                spoiler_token TEXT,
+                rom_path TEXT,
+                sha256 TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self.db.commit()
+
+    @classmethod
+    def open(cls, directory):
+        return cls(os.path.join(directory, cls.FILE))
+
+    @classmethod
+    def find(cls, directory):
+        path = os.path.join(directory, cls.FILE)
+        return cls(path) if os.path.isfile(path) else None
+
+    def add(self, result, created=None):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute("""
+                INSERT INTO seeds (seed_id, seed_url, preset, sprite, color, race_mode, spoiler_token, rom_path, sha256, created, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(seed_id) DO UPDATE SET
+                    seed_url = COALESCE(excluded.seed_url, seed_url),
+                    preset = COALESCE(excluded.preset, preset),
+                    sprite = COALESCE(excluded.sprite, sprite),
+                    color = COALESCE(excluded.color, color),
+                    race_mode = MAX(excluded.race_mode, race_mode),
+                    spoiler_token = COALESCE(excluded.spoiler_token, spoiler_token),
+                    rom_path = COALESCE(excluded.rom_path, rom_path),
+                    sha256 = COALESCE(excluded.sha256, sha256),
+                    updated = excluded.updated
+            """, (
+                result.seed_id, result.seed_url, result.preset, result.sprite, result.color, int(bool(result.race_mode)),
+                result.spoiler_token, result.rom_path, result.sha256, created or now, now
+            ))
+
+    def token(self, seed_id):
+        with self.lock:
+            row = self.db.execute("SELECT spoiler_token FROM seeds WHERE seed_id = ?", (seed_id,)).fetchone()
+        return row['spoiler_token'] if row else None
+
+    def query(self, **filters):
+        unknown = set(filters) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+        where = " AND ".join(f"{field} GLOB ?" for field in filters)
+        sql = "SELECT * FROM seeds" + (f" WHERE {where}" if where else "") + " ORDER BY created"
+        with self.lock:
+            return [dict(row) for row in self.db.execute(sql, tuple(filters.values()))]
+
+    def close(self):
+        self.db.close()
+
+def run_slot(generator, scheduler, manifest, slot, out=quiet, on_retry=None):
+    plan = manifest.slots[slot - 1]
+
+    def on_checkpoint(state, fields):
+        manifest.record(slot, state, **fields)
+
+    def attempt():
+        state = manifest.state(slot)
+        if state.get('seed_id'):
+            out(f"♻️  Downloading seed {state['seed_id']} again...", end="", flush=True)
             try:
-                os.rename(old_path, new_path)
-            except:
+                result = generator.download(
+                    state['seed_id'], plan['sprite'], plan['color'], plan['preset'], state.get('race_mode', False),
+                    state.get('spoiler_token'), slot, on_checkpoint
+                )
+                out(" ✓")
+                return result
+            except HttpStatusError as e:
+                if e.status != 404:
+                    raise
+                out(" ❌ (seed is gone, generating a new one)")
+                manifest.record(slot, 'discarded', seed_id=None, rom_path=None)
+        return generator.generate(plan['preset'], plan['sprite'], plan['color'], out=out, seed_num=slot, on_checkpoint=on_checkpoint)
+
+    return scheduler.run(generator, attempt, on_retry)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description='Automatically generate randomized Super Metroid ROMs.',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        usage='%(prog)s [-h] [-l] | [-t SEED [SEED ...] [-b BROWSER] [-w WORKERS]] | [-i INPUT] [-p PRESET] [-o OUTPUT] [-g GENERATE] [-r] [-s SPRITE] [-c COLOR] [-b BROWSER] [-e ENGINE] [-w WORKERS]'
+    )
+    parser.add_argument('-p', '--preset', help='JSON preset file, preset name, or comma-separated list for multiple seeds')
+    parser.add_argument('-i', '--input', help='Original Super Metroid ROM file')
+    parser.add_argument('-o', '--output', help='Output directory for generated ROM (default: current directory)')
+    parser.add_argument('-g', '--generate', type=int, default=1, help='Number of seeds to generate (default: 1)')
+    parser.add_argument('-r', '--random', action='store_true', help='Randomize Samus sprite and E-Tank color for each seed')
+    parser.add_argument('-s', '--sprite', help='Specify Samus sprite (use a valid sprite name)')
+    parser.add_argument('-c', '--color', help='Specify E-Tank color (use a valid hex code)')
+    parser.add_argument('-b', '--browser', choices=['chrome', 'firefox'], default='chrome', help='Browser to use (default: chrome)')
+    parser.add_argument('-t', '--token', nargs='+', metavar='SEED', help=f'Seed IDs or URLs to unlock spoiler maps for, @FILE with one seed per line, or @{SeedIndex.FILE} for every race seed in an index')
+    parser.add_argument('--json', action='store_true', help='With several -t seeds, print one JSON object per seed instead of a table')
+    parser.add_argument('--lean', action='store_true', help='Run the browser without images, fonts, trackers, background networking or extensions, with a disk cache kept between runs')
+    parser.add_argument('--recycle-after', type=int, metavar='SEEDS', help='Replace each browser with a fresh one after it has generated this many seeds')
+    parser.add_argument('--max-rss', type=int, metavar='MB', help='Replace a browser once its processes use more than this much memory after a seed')
+    parser.add_argument('-e', '--engine', choices=['selenium', 'http'], default='selenium', help='Generation backend: drive a browser or post directly over HTTP (default: selenium)')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of browsers generating seeds in parallel (default: 1)')
+    parser.add_argument('--resume', action='store_true', help='Finish the last batch in the output directory, skipping seeds that are already done')
+    parser.add_argument('--retries', type=int, default=2, help='Retry a seed this many times after a transient failure, with jittered exponential backoff (default: 2)')
+    parser.add_argument('--budget', type=float, metavar='SECONDS', help='Fail a seed attempt that takes longer than this, naming the phase it was in')
+    parser.add_argument('--rpm', type=float, help='Start at most this many generations per minute across all workers')
+    parser.add_argument('--base-url', default=os.environ.get('MAPRANDO_URL', DEFAULT_BASE_URL), help=f'Map Randomizer site to talk to (default: {DEFAULT_BASE_URL})')
+    parser.add_argument('--trace', metavar='FILE', help='Write per-seed phase timings as JSON lines to FILE and print a summary')
+    parser.add_argument('--serve', metavar='ADDRESS', help='Run as a daemon taking jobs over HTTP on [HOST:]PORT or a Unix socket at unix:PATH')
+    parser.add_argument('--stockpile', action='append', metavar='PRESET=TARGET[:LOW]', help='With --serve, keep TARGET ready seeds of PRESET and refill once fewer than LOW remain (repeatable)')
+    parser.add_argument('--queue-size', type=int, default=100, help='Most seeds --serve will hold in its queue before refusing jobs (default: 100)')
+    parser.add_argument('--offline', action='store_true', default=bool(os.environ.get('MAPRANDOGEN_OFFLINE')), help='Never download the user-agent list; use the cached copy or a built-in one')
+    parser.add_argument('--store', choices=['rom', 'delta'], default='rom', help='Keep each seed as a full ROM or as a small BPS patch against the input ROM (default: rom)')
+    parser.add_argument('--variants', type=int, default=0, metavar='N', help='Also write N sprite/E-Tank color variants of each seed, patched locally from cached cosmetic data (default: 0)')
+    parser.add_argument('--verify', nargs='+', metavar='DIR', help=f'Check every file listed in {ChecksumLog.FILE} in DIR for missing, truncated or corrupt ROMs')
+    parser.add_argument('--reconstruct', nargs='+', metavar='PATH', help='Rebuild .sfc ROMs from .bps patches (files or folders) using the -i ROM as the base')
+    parser.add_argument('--query', nargs='*', metavar='FIELD=VALUE', help=f'List seeds from {SeedIndex.FILE} in the output directory, optionally filtered with glob patterns (e.g. race_mode=1 preset=*Tournament*)')
+    parser.add_argument('--import-tokens', metavar='DIR', help=f'Add the SpoilerToken_*.txt files in DIR to {SeedIndex.FILE} in the output directory')
+    parser.add_argument('-l', '--list', action='store_true', help='List all available Samus sprites and E-Tank colors')
+    return parser
+
+def print_catalog():
+    print("\n╔════════════════════════╗")
+    print("║  Sprites and Colors    ║")
+    print("╚════════════════════════╝\n")
+    print("SAMUS SPRITES:")
+    print("─" * 70)
+    max_display_len = max(len(name) for name in samus_sprites.values())
+    for sprite_id, display_name in samus_sprites.items():
+        padding = max_display_len - len(display_name)
+        print(f"  {display_name}{' ' * padding}  =  {sprite_id}")
+    print("\n\nE-TANK COLORS:")
+    print("─" * 70)
+    max_color_len = max(len(name) for name in etank_colors.values())
+    for color_id, display_name in etank_colors.items():
+        padding = max_color_len - len(display_name)
+        print(f"  {display_name}{' ' * padding}  =  {color_id}")
+    print("\n")
+
+def parse_seed_id(seed_input):
+    seed_input = seed_input.strip()
+    if seed_input.startswith('http'):
+        if '/seed/' not in seed_input:
+            return None
+        return seed_input.rstrip('/').split('/seed/')[-1].split('/')[0].split('?')[0]
+    return seed_input
+
+def read_spoiler_token_file(token_file_path):
+    token = url = None
+    try:
+        with open(token_file_path, 'r') as f:
+            for line in f:
+                if line.startswith('Spoiler Token:'):
+                    token = line.split('Spoiler Token:')[1].strip()
+                elif line.startswith('URL:'):
+                    url = line.split('URL:')[1].strip()
+    except Exception:
+        pass
+    return token, url
+
+def find_spoiler_token(seed_id, search_directories):
+    for search_dir in search_directories:
+        seed_index = SeedIndex.find(search_dir)
+        if seed_index is not None:
+            try:
+                token = seed_index.token(seed_id)
+            finally:
+                seed_index.close()
+            if token:
+                return token, os.path.join(search_dir, SeedIndex.FILE)
+        token_file_path = os.path.join(search_dir, f"SpoilerToken_{seed_id}.txt")
+        if os.path.exists(token_file_path):
+            token, _ = read_spoiler_token_file(token_file_path)
+            if token:
+                return token, token_file_path
+    return None, None
+
+def import_token_files(seed_index, directory, base_url=DEFAULT_BASE_URL):
+    imported = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not (entry.name.startswith('SpoilerToken_') and entry.name.endswith('.txt')):
+                continue
+            seed_id = entry.name[len('SpoilerToken_'):-len('.txt')]
+            token, url = read_spoiler_token_file(entry.path)
+            if not token:
+                continue
+            rom_path = os.path.join(directory, f"Super Metroid Randomap {seed_id}.sfc")
+            patch_path = os.path.splitext(rom_path)[0] + ".bps"
+            sha256 = None
+            if os.path.isfile(rom_path):
+                sha256 = hash_file(rom_path)
+            elif os.path.isfile(patch_path):
+                rom_path = patch_path
+                sha256 = json.loads(bps_metadata(patch_path) or b"{}").get('sha256')
+            else:
+                rom_path = None
+            result = SeedResult(
+                seed_id=seed_id,
+                seed_url=url or f"{base_url.rstrip('/')}/seed/{seed_id}",
+                rom_path=os.path.abspath(rom_path) if rom_path else None,
+                preset=None,
+                sprite=None,
+                color=None,
+                race_mode=True,
+                spoiler_token=token,
+                sha256=sha256
+            )
+            seed_index.add(result, entry.stat().st_mtime)
+            imported += 1
+    return imported
+
+def run_import_tokens(args, output_dir):
+    if not os.path.isdir(args.import_tokens):
+        print(f"❌ Error: '{args.import_tokens}' is not a directory")
+        return 1
+    seed_index = SeedIndex.open(output_dir)
+    try:
+        imported = import_token_files(seed_index, args.import_tokens, args.base_url)
+    finally:
+        seed_index.close()
+    print(f"📇 Imported {imported} spoiler token(s) into {os.path.join(output_dir, SeedIndex.FILE)}")
+    return 0
+
+def run_query(args, parser, output_dir):
+    filters = {}
+    for term in args.query:
+        field, sep, value = term.partition('=')
+        if not sep:
+            parser.error(f"Invalid query '{term}'. Expected FIELD=VALUE")
+        filters[field] = value
+    seed_index = SeedIndex.find(output_dir)
+    if seed_index is None:
+        print(f"❌ Error: No {SeedIndex.FILE} in {output_dir}")
+        return 1
+    try:
+        rows = seed_index.query(**filters)
+    except ValueError as e:
+        parser.error(f"{e}. Fields: {', '.join(SeedIndex.FIELDS)}")
+    finally:
+        seed_index.close()
+    print(f"{'seed':<12}{'preset':<16}{'sprite':<22}{'color':<8}{'race':<6}{'token':<34}created")
+    print("─" * 116)
+    for row in rows:
+        preset = os.path.splitext(os.path.basename(row['preset']))[0] if row['preset'] else '-'
+        created = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created']))
+        print(
+            f"{row['seed_id']:<12}{preset[:15]:<16}{(row['sprite'] or '-')[:21]:<22}{row['color'] or '-':<8}"
+            f"{'yes' if row['race_mode'] else 'no':<6}{row['spoiler_token'] or '-':<34}{created}"
+        )
+    print(f"\n📇 {len(rows)} seed(s)")
+    return 0
+
+def collect_unlock_targets(values, parser):
+    targets = []
+    for value in values:
+        if value.startswith('@'):
+            path = value[1:]
+            if path.endswith('.sqlite3'):
+                if not os.path.isfile(path):
+                    parser.error(f"Seed index '{path}' not found")
+                seed_index = SeedIndex(path)
+                try:
+                    rows = seed_index.query(race_mode='1')
+                finally:
+                    seed_index.close()
+                targets.extend((row['seed_id'], row['spoiler_token']) for row in rows if row['spoiler_token'])
+                continue
+            try:
+                with open(path, 'r') as f:
+                    lines = [line.split() for line in f if line.strip() and not line.lstrip().startswith('#')]
+            except OSError as e:
+                parser.error(f"Cannot read seed list '{path}': {e}")
+            entries = [(fields[0], fields[1] if len(fields) > 1 else None) for fields in lines]
+        else:
+            entries = [(entry, None) for entry in value.split(',') if entry.strip()]
+        for entry, token in entries:
+            seed_id = parse_seed_id(entry)
+            if not seed_id:
+                parser.error(f"Invalid seed URL format '{entry}'. Expected: https://maprando.com/seed/XXXXXXXXX or just the seed ID")
+            targets.append((seed_id, token))
+    unique = {}
+    for seed_id, token in targets:
+        if token or seed_id not in unique:
+            unique[seed_id] = token
+    return list(unique.items())
+
+def run_token_unlock(args, parser):
+    if any([args.input, args.preset, args.generate != 1, args.random, args.sprite, args.color, args.serve, args.resume]):
+        parser.error("-t/--token cannot be used with other generation arguments")
+    targets = collect_unlock_targets(args.token, parser)
+    if not targets:
+        parser.error("No seeds to unlock")
+    search_directories = [os.path.abspath(args.output)] if args.output else []
+    search_directories.append(os.getcwd())
+    if len(targets) > 1:
+        return run_unlock_pool(args, targets, search_directories)
+    print("\n╔═════════════════════════╗")
+    print("║  Spoiler Map Unlocker   ║")
+    print("╚═════════════════════════╝\n")
+    seed_id, spoiler_token = targets[0]
+    print(f"🔑 Seed ID: {seed_id}")
+    token_source = None
+    if not spoiler_token:
+        spoiler_token, token_source = find_spoiler_token(seed_id, search_directories)
+    if token_source:
+        if token_source.endswith(SeedIndex.FILE):
+            print(f"📇 Found token in seed index: {token_source}")
+        else:
+            print(f"📄 Found token file: {os.path.basename(token_source)}")
+        print(f"🔓 Using token from file")
+    elif not spoiler_token:
+        spoiler_token = input("🔐 Enter spoiler token: ").strip()
+        if not spoiler_token:
+            print("❌ Error: Spoiler token cannot be empty")
+            return 1
+    generator = Generator(browser=args.browser, engine=args.engine, base_url=args.base_url, offline=args.offline, lean=args.lean)
+    try:
+        visualizer_url = generator.unlock_spoiler(seed_id, spoiler_token, out=print)
+        print(f"\n✅ Success! Spoiler map unlocked")
+        print(f"🗺️  Interactive Map URL:")
+        print(f"   {visualizer_url}\n")
+    except SpoilerUnlockError as e:
+        print(f" ❌")
+        print(f"\n❌ Error: {e}")
+        print("   The token may be invalid or the seed may not be in race mode\n")
+        return 1
+    except Exception as e:
+        print(f" ❌")
+        print(f"\n❌ Error: {str(e)}\n")
+        return 1
+    finally:
+        generator.close()
+    return 0
+
+def run_unlock_pool(args, targets, search_directories):
+    jobs = queue.Queue()
+    for seed_id, token in targets:
+        if not token:
+            token, _ = find_spoiler_token(seed_id, search_directories)
+        jobs.put((seed_id, token))
+    print_lock = threading.Lock()
+    failures = []
+
+    def report(seed_id, status, visualizer_url=None, error=None):
+        with print_lock:
+            if status != 'ok':
+                failures.append(seed_id)
+            if args.json:
+                print(json.dumps({'seed_id': seed_id, 'status': status, 'visualizer_url': visualizer_url, 'error': error}), flush=True)
+            else:
+                print(f"{seed_id:<12}{status:<10}{visualizer_url or error}", flush=True)
+
+    def worker(worker_id):
+        generator = Generator(browser=args.browser, engine=args.engine, base_url=args.base_url, offline=args.offline, worker_id=worker_id, lean=args.lean)
+        try:
+            while True:
+                try:
+                    seed_id, token = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if not token:
+                    report(seed_id, 'no_token', error='No spoiler token found')
+                    continue
+                try:
+                    report(seed_id, 'ok', generator.unlock_spoiler(seed_id, token))
+                except SpoilerUnlockError as e:
+                    report(seed_id, 'failed', error=str(e))
+                except Exception as e:
+                    report(seed_id, 'error', error=describe_error(e))
+                    if not generator.healthy():
+                        generator.close()
+        finally:
+            generator.close()
+
+    if not args.json:
+        print(f"{'seed':<12}{'status':<10}visualizer")
+        print("─" * 70)
+    threads = [threading.Thread(target=worker, args=(worker_id,), daemon=True) for worker_id in range(1, min(args.workers, len(targets)) + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if not args.json:
+        print(f"\n🔓 Unlocked {len(targets) - len(failures)}/{len(targets)} spoiler maps")
+    return 1 if failures else 0
+
+def plan_seeds(args, preset_list):
+    seed_plan = []
+    for preset in preset_list:
+        if args.random:
+            seed_plan.append((preset, random.choice(list(samus_sprites)), random.choice(list(etank_colors))))
+        else:
+            seed_plan.append((preset, args.sprite, args.color))
+    return seed_plan
+
+def print_customization(args, seed_num, sprite, color):
+    is_first_seed = (seed_num == 1)
+    if args.random:
+        if is_first_seed:
+            print(f"🎨 Randomizing customization for each seed")
+        print(f"   👤 Sprite: {samus_sprites.get(sprite, sprite)}")
+        print(f"   ❤️ E-Tank Color: {etank_colors.get(color, color)}")
+    elif not is_first_seed:
+        return
+    elif sprite or color:
+        if sprite:
+            print(f"🎨 Using custom sprite")
+            print(f"   👤 Sprite: {samus_sprites.get(sprite, sprite)}")
+        if color:
+            if not sprite:
+                print(f"🎨 Using custom E-Tank color")
+            print(f"   ❤️ E-Tank Color: {etank_colors.get(color, color)}")
+    else:
+        print(f"🎨 Using default customization")
+
+def describe_error(error):
+    lines = str(error).strip().splitlines()
+    return f"{type(error).__name__}: {lines[0]}" if lines else type(error).__name__
+
+def print_retry(error, attempt, delay, retries):
+    if attempt is None:
+        print(f" ❌\n   ⚠️ {describe_error(error)}, the browser crashed; restarting the seed on a new one")
+    else:
+        print(f" ❌\n   ⚠️ {describe_error(error)}, retrying in {delay:.1f} s ({attempt}/{retries})")
+
+def print_scheduler_stats(scheduler):
+    stats = scheduler.stats()
+    if stats['retries'] or scheduler.max_concurrency > 1:
+        print(f"📈 Retries: {stats['retries']}, error rate: {stats['error_rate']:.0%}, final concurrency: {stats['concurrency']}/{scheduler.max_concurrency}\n")
+
+def print_recycles(engine, count, end=""):
+    if count:
+        print(f"♻️  {'Connections' if engine == 'http' else 'Browsers'} replaced: {count}{end}")
+
+def open_generator(args, output_dir, download_dir=None, trace_log=None, worker_id=1, seed_index=None):
+    return Generator(
+        args.input, browser=args.browser, output_dir=output_dir, engine=args.engine, base_url=args.base_url,
+        download_dir=download_dir, offline=args.offline, verify_rom=False, trace_log=trace_log, worker_id=worker_id,
+        seed_index=seed_index, store=args.store, variants=args.variants, lean=args.lean,
+        recycle_after=args.recycle_after, max_rss=args.max_rss * 1024 * 1024 if args.max_rss else None, budget=args.budget
+    )
+
+def run_reconstruct(args, parser):
+    patches = []
+    for path in args.reconstruct:
+        if os.path.isdir(path):
+            patches.extend(sorted(entry.path for entry in os.scandir(path) if entry.name.endswith('.bps')))
+        elif path.endswith('.bps') and os.path.isfile(path):
+            patches.append(path)
+        else:
+            parser.error(f"'{path}' is neither a .bps file nor a folder")
+    output_dir = os.path.abspath(args.output) if args.output else None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def rebuild(patch_path):
+        rom_path = os.path.join(output_dir or os.path.dirname(patch_path), os.path.basename(patch_path)[:-len('.bps')] + '.sfc')
+        try:
+            bps_apply(args.input, patch_path, rom_path)
+            return f"🧩 {os.path.basename(rom_path)} ✓", True
+        except (BpsError, OSError, ValueError) as e:
+            return f"❌ {os.path.basename(patch_path)}: {e}", False
+
+    failures = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for line, ok in executor.map(rebuild, patches):
+            print(line)
+            failures += not ok
+    print(f"\n📦 Rebuilt {len(patches) - failures}/{len(patches)} ROM(s)")
+    return 1 if failures else 0
+
+def check_file(directory, record):
+    path = os.path.join(directory, record['file'])
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 'missing'
+    if size < record['size']:
+        return 'truncated'
+    if size != record['size']:
+        return 'resized'
+    return 'ok' if hash_file(path) == record['sha256'] else 'corrupt'
+
+def run_verify(args, parser):
+    checks = []
+    untracked = []
+    for directory in args.verify:
+        try:
+            records = ChecksumLog.load(directory)
+        except OSError:
+            parser.error(f"No {ChecksumLog.FILE} in '{directory}'")
+        checks.extend((directory, record) for record in records.values())
+        untracked.extend(
+            entry.path for entry in os.scandir(directory)
+            if entry.name.endswith(('.sfc', '.bps')) and entry.name not in records
+        )
+    counts = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        for (directory, record), status in zip(checks, executor.map(lambda check: check_file(*check), checks)):
+            counts[status] = counts.get(status, 0) + 1
+            if status != 'ok':
+                print(f"❌ {status:<10}{os.path.join(directory, record['file'])}")
+    for path in sorted(untracked):
+        print(f"❔ {'untracked':<10}{path}")
+    problems = len(checks) - counts.get('ok', 0)
+    print(f"\n🔎 Verified {counts.get('ok', 0)}/{len(checks)} file(s)" + (f", {problems} problem(s)" if problems else ""))
+    if untracked:
+        print(f"   {len(untracked)} file(s) not in {ChecksumLog.FILE}")
+    return 1 if problems else 0
+
+def run_worker_pool(args, output_dir, manifest, pending_slots, scheduler, trace_log=None, seed_index=None):
+    worker_count = min(args.workers, len(pending_slots))
+    total = len(manifest.slots)
+    seed_queue = queue.Queue()
+    for seed_num in pending_slots:
+        seed_queue.put(seed_num)
+    print_lock = threading.Lock()
+    failures = []
+    recycles = []
+
+    def report(line):
+        with print_lock:
+            print(line, flush=True)
+
+    def worker(worker_id):
+        download_dir = os.path.join(output_dir, f".worker-{worker_id}")
+        generator = open_generator(args, output_dir, download_dir, trace_log, worker_id, seed_index)
+        try:
+            generator.start()
+        except Exception as e:
+            report(f"⚠️ Worker {worker_id}: could not start: {e}")
+            generator.close()
+            return
+        try:
+            while True:
+                try:
+                    seed_num = seed_queue.get_nowait()
+                except queue.Empty:
+                    break
+                prefix = f"[{seed_num}/{total}]"
+
+                def on_retry(error, attempt, delay):
+                    if attempt is None:
+                        report(f"{prefix} ⚠️ {describe_error(error)}, the browser crashed; restarting the seed on a new one (worker {worker_id})")
+                        return
+                    report(f"{prefix} ⚠️ {describe_error(error)}, retrying in {delay:.1f} s ({attempt}/{scheduler.retries}, worker {worker_id})")
+
+                try:
+                    result = run_slot(generator, scheduler, manifest, seed_num, on_retry=on_retry)
+                except PresetNotFoundError as e:
+                    failures.append(seed_num)
+                    report(f"{prefix} ❌ Preset '{e}' not found (worker {worker_id})")
+                    continue
+                except Exception as e:
+                    failures.append(seed_num)
+                    report(f"{prefix} ❌ {describe_error(e)} (worker {worker_id})")
+                    continue
+                report(f"{prefix} ✓ {result.seed_id} → {os.path.basename(result.rom_path)} (worker {worker_id})")
+        finally:
+            generator.close()
+            recycles.append(generator.recycles)
+            try:
+                os.rmdir(download_dir)
+            except OSError:
                 pass
-        print(f"   🔗 Seed URL: {seed_url}")
-    print("\n╔════════════╗")
-    print("║  FINISHED  ║")
-    print("╚════════════╝")
-    print(f"\n📂 ROM(s) saved to: {output_dir}")
-    if args.generate > 1:
-        print(f"📊 Total seeds generated: {args.generate}\n")
+
+    if worker_count:
+        print(f"🚀 Starting {worker_count} workers...")
+    threads = [threading.Thread(target=worker, args=(worker_id,), daemon=True) for worker_id in range(1, worker_count + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print_recycles(args.engine, sum(recycles))
+    while not seed_queue.empty():
+        seed_num = seed_queue.get_nowait()
+        failures.append(seed_num)
+        report(f"[{seed_num}/{total}] ❌ No worker available to generate this seed")
+    return failures
+
+def validate_job(args, data):
+    if not isinstance(data, dict):
+        return None, "Expected a JSON object"
+    preset = data.get('preset')
+    sprite = data.get('sprite')
+    color = data.get('color')
+    count = data.get('count', 1)
+    randomize = data.get('random', False)
+    if preset is not None and not isinstance(preset, str):
+        return None, "'preset' must be a string"
+    if args.engine == 'http' and not (preset and preset.endswith('.json') and os.path.isfile(preset)):
+        return None, "The http engine needs 'preset' to be a JSON preset file on the server"
+    preset_problems = find_preset_problems([preset], args.base_url, args.offline)
+    if preset_problems:
+        return None, preset_problems[0]
+    if sprite is not None and sprite not in samus_sprites:
+        return None, f"Invalid sprite '{sprite}'"
+    if color is not None and color not in etank_colors:
+        return None, f"Invalid color '{color}'"
+    if not isinstance(randomize, bool):
+        return None, "'random' must be true or false"
+    if randomize and (sprite or color):
+        return None, "'random' cannot be combined with 'sprite' or 'color'"
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        return None, "'count' must be a positive integer"
+    return {'preset': preset, 'sprite': sprite, 'color': color, 'count': count, 'randomize': randomize}, None
+
+class JobRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        pool = self.server.pool
+        if parts.path == '/health':
+            self.send_json(200, pool.status())
+        elif parts.path == '/jobs':
+            with pool.lock:
+                jobs = list(pool.jobs.values())
+            self.send_json(200, [job.to_dict() for job in jobs])
+        elif parts.path.startswith('/jobs/'):
+            job = pool.get(parts.path[len('/jobs/'):])
+            if job is None:
+                self.send_json(404, {'error': 'Unknown job'})
+                return
+            try:
+                wait = float(query.get('wait', ['0'])[0])
+            except ValueError:
+                self.send_json(400, {'error': "'wait' must be a number of seconds"})
+                return
+            if wait > 0:
+                job.done.wait(min(wait, 600))
+            self.send_json(200, job.to_dict())
+        elif parts.path == '/stockpile' and self.server.stockpile:
+            self.send_json(200, self.server.stockpile.status())
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urllib.parse.urlsplit(self.path).path
+        if path.startswith('/stockpile/') and self.server.stockpile:
+            self.take_from_stockpile(urllib.parse.unquote(path[len('/stockpile/'):]))
+            return
+        if path != '/jobs':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': 'Invalid JSON'})
+            return
+        job_args, error = validate_job(self.server.args, data)
+        if error:
+            self.send_json(400, {'error': error})
+            return
+        try:
+            job = self.server.pool.submit(**job_args)
+        except JobQueueFull as e:
+            self.send_json(503, {'error': str(e)})
+            return
+        print(f"📥 Job {job.id}: {job.count} seed(s) with preset {job.preset or 'default'}", flush=True)
+        self.send_json(202, job.to_dict())
+
+    def take_from_stockpile(self, preset):
+        stockpile = self.server.stockpile
+        seed = stockpile.take(preset)
+        if seed:
+            print(f"📤 Handed out {seed['seed_id']} from the {preset} stockpile", flush=True)
+            self.send_json(200, seed)
+        elif preset not in stockpile.targets:
+            self.send_json(404, {'error': f"No stockpile for preset '{preset}'"})
+        else:
+            try:
+                job = self.server.pool.submit(preset)
+            except JobQueueFull as e:
+                self.send_json(503, {'error': str(e)})
+                return
+            print(f"📥 Job {job.id}: {preset} stockpile is empty, generating on demand", flush=True)
+            self.send_json(202, job.to_dict())
+
+class JobServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+class UnixJobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def open_job_server(address):
+    if address.startswith('unix:'):
+        path = address[len('unix:'):]
+        if os.path.exists(path):
+            os.unlink(path)
+        return UnixJobServer(path, JobRequestHandler), f"unix:{path}"
+    host, _, port = address.rpartition(':')
+    server = JobServer((host or '127.0.0.1', int(port)), JobRequestHandler)
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+def parse_stockpile_targets(args, parser):
+    targets = {}
+    for spec in args.stockpile or []:
+        preset, _, amounts = spec.rpartition('=')
+        target, _, low_water = amounts.partition(':')
+        try:
+            target = int(target)
+            low_water = int(low_water) if low_water else max(1, target // 2)
+        except ValueError:
+            parser.error(f"Invalid --stockpile '{spec}'. Expected PRESET=TARGET[:LOW]")
+        if not preset or target < 1 or not 0 <= low_water <= target:
+            parser.error(f"Invalid --stockpile '{spec}'. Expected PRESET=TARGET[:LOW] with 0 <= LOW <= TARGET")
+        if args.engine == 'http' and not (preset.endswith('.json') and os.path.isfile(preset)):
+            parser.error(f"-e/--engine http can only stockpile JSON preset files, not '{preset}'")
+        targets[preset] = (target, low_water)
+    preset_problems = find_preset_problems(list(targets), args.base_url, args.offline)
+    if preset_problems:
+        parser.error("\n".join(preset_problems))
+    return targets
+
+def open_outputs(args, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    trace_log = TraceLog(args.trace) if args.trace else None
+    return trace_log, SeedIndex.open(output_dir)
+
+def close_outputs(trace_log, seed_index):
+    seed_index.close()
+    if trace_log:
+        trace_log.close()
+
+def run_server(args, parser, output_dir):
+    if any([args.preset, args.generate != 1, args.random, args.sprite, args.color]):
+        parser.error("--serve takes presets and customization per job; drop -p/-g/-r/-s/-c")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+    stockpile_targets = parse_stockpile_targets(args, parser)
+    print("\n╔═══════════════════════════╗")
+    print("║  Randomap Web Generator   ║")
+    print("╚═══════════════════════════╝\n")
+    print(f"🔍 Verifying input ROM...")
+    if not check_rom_hash(verify_rom_hash(args.input)):
+        return 1
+    try:
+        server, location = open_job_server(args.serve)
+    except (OSError, ValueError) as e:
+        parser.error(f"Cannot listen on '{args.serve}': {e}")
+    trace_log, seed_index = open_outputs(args, output_dir)
+    try:
+        return serve_jobs(args, output_dir, server, location, stockpile_targets, trace_log, seed_index)
+    finally:
+        close_outputs(trace_log, seed_index)
+
+def serve_jobs(args, output_dir, server, location, stockpile_targets, trace_log, seed_index):
+    stockpile = None
+    if args.stockpile:
+        stockpile = Stockpile(os.path.join(output_dir, 'stockpile.json'), stockpile_targets)
+        for preset, (target, low_water) in stockpile_targets.items():
+            print(f"📦 {preset}: {len(stockpile.inventory[preset])}/{target} seeds in stock (refill below {low_water})")
+    print_lock = threading.Lock()
+
+    def on_seed(job, worker_id, result, error):
+        if job.background:
+            if result:
+                stockpile.add(job.preset, result)
+            else:
+                stockpile.seed_failed(job.preset)
+        label = f"stockpile {job.preset}" if job.background else f"job {job.id}"
+        with print_lock:
+            if result:
+                print(f"[{label}] ✓ {result.seed_id} → {os.path.basename(result.rom_path)} (worker {worker_id})", flush=True)
+            else:
+                print(f"[{label}] ❌ {error} (worker {worker_id})", flush=True)
+
+    def make_generator(worker_id):
+        return open_generator(args, output_dir, os.path.join(output_dir, f".worker-{worker_id}"), trace_log, worker_id, seed_index)
+
+    scheduler = AdaptiveScheduler(args.workers, args.rpm, args.retries)
+    pool = GeneratorPool(make_generator, args.workers, args.queue_size, on_seed, scheduler).start()
+    server.pool = pool
+    server.args = args
+    server.stockpile = stockpile.start(pool) if stockpile else None
+    print(f"🛰️  Serving jobs on {location} with {args.workers} worker(s), Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down...")
+    finally:
+        server.server_close()
+        if stockpile:
+            stockpile.close()
+        pool.close()
+        for worker_id in range(1, args.workers + 1):
+            try:
+                os.rmdir(os.path.join(output_dir, f".worker-{worker_id}"))
+            except OSError:
+                pass
+        if args.serve.startswith('unix:'):
+            try:
+                os.unlink(args.serve[len('unix:'):])
+            except OSError:
+                pass
+    if trace_log:
+        trace_log.print_summary()
+    return 0
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print_catalog()
+        return 0
+
+    if args.token:
+        return run_token_unlock(args, parser)
+
+    if args.verify:
+        return run_verify(args, parser)
+
+    if args.import_tokens or args.query is not None:
+        output_dir = os.path.abspath(args.output) if args.output else os.getcwd()
+        if args.import_tokens:
+            os.makedirs(output_dir, exist_ok=True)
+            return run_import_tokens(args, output_dir)
+        return run_query(args, parser, output_dir)
+
+    if not args.input:
+        parser.error("the following arguments are required: -i/--input\n\nNote: -l/--list command cannot be used with other arguments.")
+    if not os.path.isfile(args.input):
+        parser.error(f"Input ROM '{args.input}' not found")
+
+    if args.reconstruct:
+        return run_reconstruct(args, parser)
+
+    if args.sprite and args.sprite not in samus_sprites:
+        parser.error(f"Invalid sprite '{args.sprite}'. Please use a valid sprite name. Use -l to see all available sprites.")
+    if args.color and args.color not in etank_colors:
+        parser.error(f"Invalid color '{args.color}'. Please use a valid hex code. Use -l to see all available colors.")
+
+    if args.random and (args.sprite or args.color):
+        parser.error("Cannot use -r/--random with -s/--sprite or -c/--color")
+    if args.workers < 1:
+        parser.error("-w/--workers must be at least 1")
+    if args.retries < 0:
+        parser.error("--retries cannot be negative")
+    if args.rpm is not None and args.rpm <= 0:
+        parser.error("--rpm must be greater than 0")
+    if args.variants < 0:
+        parser.error("--variants cannot be negative")
+    if args.recycle_after is not None and args.recycle_after < 1:
+        parser.error("--recycle-after must be at least 1")
+    if args.max_rss is not None and args.max_rss < 1:
+        parser.error("--max-rss must be at least 1")
+    if args.budget is not None and args.budget <= 0:
+        parser.error("--budget must be greater than 0")
+
+    if args.stockpile and not args.serve:
+        parser.error("--stockpile needs --serve")
+    output_dir = os.path.abspath(args.output) if args.output else os.getcwd()
+    if args.serve:
+        return run_server(args, parser, output_dir)
+
+    if args.resume:
+        if any([args.preset, args.generate != 1, args.random, args.sprite, args.color]):
+            parser.error("--resume takes the presets and customization from the saved batch; drop -p/-g/-r/-s/-c")
+        try:
+            manifest = BatchManifest.load(output_dir)
+        except (OSError, ValueError, KeyError):
+            parser.error(f"No batch to resume in '{output_dir}'")
+        seed_plan = [(slot['preset'], slot['sprite'], slot['color']) for slot in manifest.slots]
+        args.generate = len(seed_plan)
+        args.random = manifest.randomized
     else:
+        preset_list = []
+        if args.preset:
+            if ',' in args.preset:
+                preset_list = [p.strip() for p in args.preset.split(',')]
+                if len(preset_list) != args.generate:
+                    parser.error(f"Number of presets ({len(preset_list)}) must match number of seeds to generate ({args.generate})")
+            else:
+                preset_list = [args.preset] * args.generate
+        else:
+            preset_list = [None] * args.generate
+        seed_plan = plan_seeds(args, preset_list)
+    if args.engine == 'http' and not all(p and p.endswith('.json') and os.path.isfile(p) for p, _, _ in seed_plan):
+        parser.error("-e/--engine http requires -p with JSON preset files (named presets are only available in the browser)")
+    preset_problems = find_preset_problems([preset for preset, _, _ in seed_plan], args.base_url, args.offline)
+    if preset_problems:
+        parser.error("\n".join(preset_problems))
+
+    print("\n╔═══════════════════════════╗")
+    print("║  Randomap Web Generator   ║")
+    print("╚═══════════════════════════╝\n")
+
+    print(f"🔍 Verifying input ROM...")
+    if not check_rom_hash(verify_rom_hash(args.input)):
+        if args.resume:
+            manifest.close()
+        return 1
+    trace_log, seed_index = open_outputs(args, output_dir)
+    if not args.resume:
+        manifest = BatchManifest.create(output_dir, seed_plan, args.random)
+    pending_slots = [slot['slot'] for slot in manifest.slots if not manifest.is_done(slot['slot'])]
+    if args.resume:
+        print(f"♻️  Resuming batch: {len(seed_plan) - len(pending_slots)}/{len(seed_plan)} seeds already done")
+
+    scheduler = AdaptiveScheduler(args.workers, args.rpm, args.retries)
+    if args.workers > 1:
+        try:
+            failures = run_worker_pool(args, output_dir, manifest, pending_slots, scheduler, trace_log, seed_index)
+        finally:
+            manifest.close()
+            close_outputs(trace_log, seed_index)
+        print("\n╔════════════╗")
+        print("║  FINISHED  ║")
+        print("╚════════════╝")
+        print(f"\n📂 ROM(s) saved to: {output_dir}")
+        print(f"📊 Total seeds generated: {args.generate - len(failures)}")
+        if failures:
+            print(f"❌ Failed seeds: {len(failures)} ({', '.join(str(seed_num) for seed_num in sorted(failures))})")
         print()
-finally:
-    driver.quit()
+        print_scheduler_stats(scheduler)
+        if trace_log:
+            trace_log.print_summary()
+        return 1 if failures else 0
+
+    generator = open_generator(args, output_dir, trace_log=trace_log, seed_index=seed_index)
+    failures = []
+    try:
+        generator.start()
+        for seed_num in pending_slots:
+            _, sprite, color = seed_plan[seed_num - 1]
+            if args.generate > 1:
+                print(f"[{seed_num}/{args.generate}] ", end="", flush=True)
+            print_customization(args, seed_num, sprite, color)
+            try:
+                result = run_slot(generator, scheduler, manifest, seed_num, out=print, on_retry=lambda e, attempt, delay: print_retry(e, attempt, delay, args.retries))
+            except PresetNotFoundError:
+                return 1
+            except Exception as e:
+                if not (is_transient_error(e) or generator.crashed):
+                    raise
+                print(f"   ❌ Error: {e}")
+                failures.append(seed_num)
+                continue
+            if result.variants:
+                print(f"   🎨 Cosmetic variants: {len(result.variants)}")
+        print("\n╔════════════╗")
+        print("║  FINISHED  ║")
+        print("╚════════════╝")
+        print(f"\n📂 ROM(s) saved to: {output_dir}")
+        if args.generate > 1:
+            print(f"📊 Total seeds generated: {args.generate - len(failures)}\n")
+        else:
+            print()
+        print_scheduler_stats(scheduler)
+        print_recycles(args.engine, generator.recycles, "\n")
+    finally:
+        generator.close()
+        manifest.close()
+        close_outputs(trace_log, seed_index)
+    if trace_log:
+        trace_log.print_summary()
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import argparse
+import email.parser
+import email.policy
+import html
+import http.server
+import json
+import random
+import re
+import secrets
+import threading
+import time
+
+ROM_SIZE = 4 * 1024 * 1024
+SEED_CHANGES = 2048
+SPRITE_OFFSET = 0x1C0000
+SPRITE_SIZE = 0x4000
+ETANK_COLOR_OFFSET = 0x1C8000
+
+GENERATE_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Generate - Mock Map Randomizer</title></head>
+<body>
+<select id="fullSettingsPreset" onchange="applyPreset()">
+    <option>Default</option>
+    <option>Tournament</option>
+</select>
+<input type="radio" name="race_mode" id="raceModeNo" value="false" checked>
+<input type="radio" name="race_mode" id="raceModeYes" value="true">
+<button type="button" data-bs-target="#managePresetsModal" onclick="showModal('managePresetsModal')">Manage Presets</button>
+<div class="modal" id="managePresetsModal" style="display: none">
+    <h1>Manage Settings Presets</h1>
+    <input type="file" id="importPresetFile" onchange="importPreset(this)">
+    <button type="button" onclick="hideModal('managePresetsModal')">Close</button>
+</div>
+<button type="button" onclick="generateGame()">Generate Game</button>
+<script>
+const presets = {
+    "Default": {"other_settings": {"race_mode": false}},
+    "Tournament": {"other_settings": {"race_mode": true}}
+};
+const presetSelect = document.getElementById('fullSettingsPreset');
+const importedPresets = JSON.parse(localStorage.getItem('importedPresets') || '{}');
+for (const [name, settings] of Object.entries(importedPresets)) {
+    addPreset(name, settings);
+}
+function addPreset(name, settings) {
+    if (!(name in presets)) {
+        const option = document.createElement('option');
+        option.text = name;
+        presetSelect.add(option);
+    }
+    presets[name] = settings;
+}
+function showModal(id) {
+    const modal = document.getElementById(id);
+    modal.style.display = 'block';
+    modal.classList.add('show');
+}
+function hideModal(id) {
+    const modal = document.getElementById(id);
+    modal.style.display = 'none';
+    modal.classList.remove('show');
+}
+async function importPreset(input) {
+    const file = input.files[0];
+    const name = file.name.replace(/\\.json$/, '');
+    addPreset(name, JSON.parse(await file.text()));
+    importedPresets[name] = presets[name];
+    localStorage.setItem('importedPresets', JSON.stringify(importedPresets));
+}
+function applyPreset() {
+    const settings = presets[presetSelect.value] || {};
+    const raceMode = !!(settings.other_settings || {}).race_mode;
+    document.getElementById('raceModeYes').checked = raceMode;
+    document.getElementById('raceModeNo').checked = !raceMode;
+}
+async function generateGame() {
+    const token = Array.from(crypto.getRandomValues(new Uint8Array(16)), b => b.toString(16).padStart(2, '0')).join('');
+    localStorage.setItem('spoilerToken', token);
+    const settings = Object.assign({}, presets[presetSelect.value]);
+    settings.other_settings = Object.assign({}, settings.other_settings, {race_mode: document.getElementById('raceModeYes').checked});
+    const form = new FormData();
+    form.append('spoiler_token', token);
+    form.append('settings', JSON.stringify(settings));
+    const response = await fetch('/randomize', {method: 'POST', body: form});
+    const result = await response.json();
+    window.location.href = result.seed_url;
+}
+</script>
+</body>
+</html>
+"""
+
+SEED_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Seed {seed_id} - Mock Map Randomizer</title></head>
+<body>
+<h2>Seed {seed_id}</h2>
+<div class="modal" id="inputRomModal" style="display: none">
+    <h1>Input ROM</h1>
+    <form method="post" action="/seed/{seed_id}/customize" enctype="multipart/form-data">
+        <input type="file" id="inputRom" name="rom">
+        <input type="hidden" name="samus_sprite" value="">
+        <input type="hidden" name="etank_color" value="">
+        <input type="submit" value="Download ROM">
+    </form>
+</div>
+<form id="unlockForm" style="display: none" onsubmit="unlockSeed(event)">
+    <input type="hidden" name="spoiler_token" value="">
+    <input type="submit" value="Unlock">
+</form>
+<div id="spoiler">{spoiler}</div>
+<script>
+const customization = JSON.parse(localStorage.getItem('customization-form') || '{{}}');
+for (const name of ['samus_sprite', 'etank_color']) {{
+    document.querySelector(`input[name="${{name}}"]`).value = customization[name] || '';
+}}
+document.querySelector('#unlockForm input[name="spoiler_token"]').value = localStorage.getItem('spoilerToken') || '';
+async function unlockSeed(event) {{
+    event.preventDefault();
+    const response = await fetch('/seed/{seed_id}/unlock', {{method: 'POST', body: new FormData(event.target)}});
+    document.getElementById('spoiler').innerHTML = await response.text();
+}}
+</script>
+</body>
+</html>
+"""
+
+VISUALIZER_LINK = '<a href="/seed/{seed_id}/visualizer/index.html">Spoiler map</a>'
+
+
+def parse_multipart(content_type, body):
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = part.get_payload(decode=True)
+    return fields
+
+
+def build_rom(base_rom, seed_id, sprite, etank_color, size):
+    rom = bytearray(base_rom[:size])
+    rng = random.Random(seed_id)
+    if len(rom) < size:
+        rom.extend(rng.randbytes(size - len(rom)))
+    for _ in range(SEED_CHANGES):
+        offset = rng.randrange(0, SPRITE_OFFSET)
+        rom[offset] = rng.randrange(256)
+    if sprite and size >= SPRITE_OFFSET + SPRITE_SIZE:
+        rom[SPRITE_OFFSET:SPRITE_OFFSET + SPRITE_SIZE] = random.Random(f"sprite:{sprite}").randbytes(SPRITE_SIZE)
+    if etank_color and size >= ETANK_COLOR_OFFSET + 3:
+        rom[ETANK_COLOR_OFFSET:ETANK_COLOR_OFFSET + 3] = bytes.fromhex(etank_color)
+    return bytes(rom)
+
+
+class MockHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_form(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        return parse_multipart(self.headers.get("Content-Type", ""), body)
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        seed_match = re.fullmatch(r"/seed/([A-Za-z0-9]+)/?", path)
+        if path == "/generate":
+            self.send_body(200, "text/html; charset=utf-8", GENERATE_PAGE.encode())
+        elif seed_match and seed_match.group(1) in self.server.seeds:
+            seed_id = seed_match.group(1)
+            page = SEED_PAGE.format(seed_id=seed_id, spoiler="")
+            self.send_body(200, "text/html; charset=utf-8", page.encode())
+        else:
+            self.send_body(404, "text/plain", b"Not found")
+
+    def do_POST(self):
+        path = self.path.split('?')[0]
+        if path == "/randomize":
+            self.randomize()
+            return
+        match = re.fullmatch(r"/seed/([A-Za-z0-9]+)/(customize|unlock)", path)
+        if not match or match.group(1) not in self.server.seeds:
+            self.read_form()
+            self.send_body(404, "text/plain", b"Not found")
+        elif match.group(2) == "customize":
+            self.customize(match.group(1))
+        else:
+            self.unlock(match.group(1))
+
+    def randomize(self):
+        form = self.read_form()
+        settings = json.loads(form.get("settings", b"{}") or b"{}")
+        race_mode = bool(settings.get("other_settings", {}).get("race_mode", False))
+        self.server.wait_for_generation()
+        if random.random() < self.server.error_rate:
+            self.send_body(503, "text/plain", b"Server busy")
+            return
+        seed_id = secrets.token_urlsafe(8).replace('-', 'x').replace('_', 'y')[:9]
+        token = (form.get("spoiler_token") or b"").decode()
+        with self.server.lock:
+            self.server.seeds[seed_id] = token if race_mode else None
+        body = json.dumps({"seed_url": f"/seed/{seed_id}/"}).encode()
+        self.send_body(200, "application/json", body)
+
+    def customize(self, seed_id):
+        form = self.read_form()
+        rom = build_rom(
+            form.get("rom") or b"",
+            seed_id,
+            (form.get("samus_sprite") or b"").decode(),
+            (form.get("etank_color") or b"").decode(),
+            self.server.payload_size
+        )
+        headers = {"Content-Disposition": f'attachment; filename="map-rando-{seed_id}.sfc"'}
+        self.send_body(200, "application/octet-stream", rom, headers)
+
+    def unlock(self, seed_id):
+        form = self.read_form()
+        token = (form.get("spoiler_token") or b"").decode()
+        expected = self.server.seeds.get(seed_id)
+        if expected and secrets.compare_digest(token, expected):
+            self.send_body(200, "text/html; charset=utf-8", VISUALIZER_LINK.format(seed_id=html.escape(seed_id)).encode())
+        else:
+            self.send_body(403, "text/html; charset=utf-8", b"Invalid spoiler token")
+
+
+class MockMaprandoServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=1.0, jitter=0.25, payload_size=ROM_SIZE, verbose=False, error_rate=0.0):
+        super().__init__((host, port), MockHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_size = payload_size
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.seeds = {}
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def wait_for_generation(self):
+        if self.latency > 0:
+            time.sleep(max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the maprando.com generation flow.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--latency', type=float, default=1.0, help='Mean artificial generation latency in seconds (default: 1.0)')
+    parser.add_argument('--jitter', type=float, default=0.25, help='Uniform jitter around the latency in seconds (default: 0.25)')
+    parser.add_argument('--payload-size', type=int, default=ROM_SIZE, help=f'Size of the returned ROM in bytes (default: {ROM_SIZE})')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of generations that fail with a 503 (default: 0)')
+    args = parser.parse_args()
+    server = MockMaprandoServer(args.host, args.port, args.latency, args.jitter, args.payload_size, verbose=True, error_rate=args.error_rate)
+    print(f"🧪 Mock Map Randomizer listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import json
+import random
+import time
+
+import benchmark
+import maprandogen
+
+
+def make_roms():
+    rng = random.Random(17)
+    source = bytearray(rng.randbytes(64 * 1024))
+    target = bytearray(source)
+    for offset in range(0, len(target), 4096):
+        target[offset + 100:offset + 140] = bytes([offset // 4096]) * 40
+        target[offset + 300:offset + 320] = b"\xff" * 20
+        target[offset + 500:offset + 503] = rng.randbytes(3)
+    target += b"\x00" * 5000
+    return bytes(source), bytes(target)
+
+
+def test_bps_round_trip_with_several_fill_runs(tmp_path):
+    source, target = make_roms()
+    patch = maprandogen.bps_encode(source, target, b'{"seed_id": "test"}')
+    output = bytearray(len(target))
+    maprandogen.bps_decode(memoryview(patch), memoryview(source), output, 'test.bps')
+    assert output == target
+
+    source_path, patch_path, output_path = tmp_path / "base.sfc", tmp_path / "test.bps", tmp_path / "test.sfc"
+    source_path.write_bytes(source)
+    patch_path.write_bytes(patch)
+    maprandogen.bps_apply(str(source_path), str(patch_path), str(output_path))
+    assert output_path.read_bytes() == target
+    assert maprandogen.bps_metadata(str(patch_path)) == b'{"seed_id": "test"}'
+
+
+def test_store_delta_keeps_rom_it_cannot_rebuild(tmp_path, monkeypatch):
+    source, target = make_roms()
+    rom_path = tmp_path / "Super Metroid Randomap test.sfc"
+    rom_path.write_bytes(target)
+    encode = maprandogen.bps_encode
+    monkeypatch.setattr(maprandogen, 'bps_encode', lambda *args: encode(source[:-1] + b"\x00", *args[1:]))
+    try:
+        maprandogen.store_delta(str(rom_path), source, {'seed_id': 'test'})
+    except maprandogen.BpsError:
+        pass
+    else:
+        raise AssertionError("store_delta accepted a patch that does not rebuild the ROM")
+    assert rom_path.read_bytes() == target
+    assert not (tmp_path / "Super Metroid Randomap test.bps").exists()
+
+
+def test_store_delta_replaces_rom_with_patch(tmp_path):
+    source, target = make_roms()
+    rom_path = tmp_path / "Super Metroid Randomap test.sfc"
+    rom_path.write_bytes(target)
+    patch_path, _ = maprandogen.store_delta(str(rom_path), source, {'seed_id': 'test'})
+    assert not rom_path.exists()
+    assert json.loads(maprandogen.bps_metadata(patch_path)) == {'seed_id': 'test'}
+
+
+def test_budget_lets_a_finished_phase_stand():
+    trace = maprandogen.SeedTrace(1, 1, budget=0.01)
+    with trace.phase('download'):
+        time.sleep(0.02)
+    try:
+        with trace.phase('store'):
+            pass
+    except maprandogen.BudgetExceededError as e:
+        assert "'download' phase" in str(e)
+    else:
+        raise AssertionError("a phase started after the deadline")
+
+
+def test_listing_starts_fast_without_selenium():
+    p50, selenium_loaded = benchmark.measure_startup(['-l'])
+    assert not selenium_loaded
+    assert p50 <= benchmark.STARTUP_BUDGET
+
+
+def test_invalid_sprite_fails_fast_without_selenium(tmp_path):
+    rom_path = tmp_path / "rom.sfc"
+    rom_path.write_bytes(b"\x00")
+    p50, selenium_loaded = benchmark.measure_startup(['-i', str(rom_path), '-s', 'not_a_sprite'])
+    assert not selenium_loaded
+    assert p50 <= benchmark.STARTUP_BUDGET
+
+
+def test_bps_copies_moved_data_from_the_base():
+    source, _ = make_roms()
+    target = bytearray(source)
+    target[16:32 * 1024 + 16] = source[:32 * 1024]
+    target[40 * 1024:48 * 1024] = source[56 * 1024:64 * 1024]
+    patch = maprandogen.bps_encode(source, bytes(target))
+    assert len(patch) < 1024
+    output = bytearray(len(target))
+    maprandogen.bps_decode(memoryview(patch), memoryview(source), output, 'moved.bps')
+    assert output == target